@@ -1,10 +1,16 @@
-import os
-
-from django.contrib import admin
-
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import QueryDict, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import reverse, path
+from django.utils import timezone
+from django.utils.html import format_html
+
+from lessons.forms import CatalogImportForm
+from lessons.exporter import ndjson_chunks
+from lessons.importer import CatalogImporter, CSV_COLUMNS, file_records
 from lessons.models import School, Lesson, Content
-from main.admin import ModelAdmin, default_site
-from school import settings
+from main.admin import ModelAdmin
 
 
 class ContentInlineAdmin(admin.TabularInline):
@@ -13,61 +19,107 @@ class ContentInlineAdmin(admin.TabularInline):
     fields = ('provider', 'text')
 
 
-class SchoolProxyAdmin(ModelAdmin):
-    list_display = ('title', 'position')
+@admin.register(Lesson)
+class LessonAdmin(ModelAdmin):
+    school_lookup = 'school__id__exact'
+
+    list_display = ('title', 'position', 'school')
+    list_select_related = ('school', )
     prepopulated_fields = {'slug': ('title',)}
     list_editable = ('position',)
     list_display_links = ('title',)
-    fieldsets = (
-        (None, {'fields': ('position', 'title', 'slug', 'description', 'cover')}),
-        (None, {'fields': ('school',), 'classes': ('hidden',)})
-    )
-    add_fieldsets = (
-        (None, {'fields': ('position', 'title', 'slug', 'description', 'cover')}),
-    )
+    list_filter = ('school', 'contents__content_type')
+    ordering = ('school__position', 'position')
+    fields = ('school', 'position', 'title', 'slug', 'description', 'cover')
 
     inlines = (ContentInlineAdmin, )
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(school=self.model.base)
-
     def get_changeform_initial_data(self, request):
         initial = super().get_changeform_initial_data(request)
-        initial['school'] = self.model.base.id
+        # lesson added from the list of one school
+        filters = QueryDict(request.GET.get('_changelist_filters', ''))
+        if school_id := filters.get(self.school_lookup):
+            initial.setdefault('school', school_id)
         return initial
 
 
-def refresh_urls():
-    from django.urls.base import clear_url_caches
-    from importlib import reload, import_module
-    reload(import_module(settings.ROOT_URLCONF))
-    clear_url_caches()
-
-
-def add_school_to_lessons_admin(obj: School):
-    meta = type('Meta', (object,), {
-        'proxy': True, 'verbose_name': f'Урок {obj.title}', 'verbose_name_plural': obj.title
-    })
-    proxy_model_dict = {'Meta': meta, 'base': obj, '__module__': 'main'}
-    SchoolProxyModel = type(obj.slug.replace("-", "_"), (Lesson,), proxy_model_dict)
-    default_site.register(SchoolProxyModel, SchoolProxyAdmin)
-
-
 @admin.register(School)
 class SchoolsAdmin(ModelAdmin):
-    list_display = ('title', 'position')
+    list_display = ('title', 'position', 'lessons_link')
     prepopulated_fields = {'slug': ('title',)}
     list_editable = ('position',)
     list_display_links = ('title',)
 
-    def save_model(self, request, obj, form, change):
-        super().save_model(request, obj, form, change)
-        if not change:
-            add_school_to_lessons_admin(obj)
-            refresh_urls()
-
-
-if not os.environ.get('MIGRATION_ALERT'):
-    for school in School.objects.all():
-        add_school_to_lessons_admin(school)
-    refresh_urls()
+    @admin.display(description='Уроки')
+    def lessons_link(self, obj: School) -> str:
+        url = reverse('admin:lessons_lesson_changelist')
+        return format_html('<a href="{}?{}={}">Уроки школы</a>', url, LessonAdmin.school_lookup, obj.id)
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='lessons_school_import'),
+            path('export/', self.admin_site.admin_view(self.export_view), name='lessons_school_export'),
+            *super().get_urls(),
+        ]
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        if self.has_import_permission(request):
+            self.get_custom_object_tools_list(extra_context).append(
+                {'url': reverse('admin:lessons_school_import'), 'title': 'Импорт'}
+            )
+        if self.has_export_permission(request):
+            self.get_custom_object_tools_list(extra_context).append(
+                {'url': reverse('admin:lessons_school_export') + '?gzip=1', 'title': 'Экспорт'}
+            )
+        return super().changelist_view(request, extra_context)
+
+    def has_import_permission(self, request) -> bool:
+        return all(
+            request.user.has_perm(f'lessons.add_{model._meta.model_name}') for model in (School, Lesson, Content)
+        )
+
+    def has_export_permission(self, request) -> bool:
+        return all(
+            request.user.has_perm(f'lessons.view_{model._meta.model_name}') for model in (School, Lesson, Content)
+        )
+
+    def export_view(self, request):
+        """Whole catalog as ndjson, streamed while it is read from the database, gzipped with ?gzip=1"""
+        if not self.has_export_permission(request):
+            raise PermissionDenied
+        compress = bool(request.GET.get('gzip'))
+        name = timezone.localtime().strftime('catalog-%Y%m%d-%H%M%S.ndjson') + ('.gz' if compress else '')
+        response = StreamingHttpResponse(
+            ndjson_chunks(compress=compress), content_type='application/gzip' if compress else 'application/x-ndjson'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{name}"'
+        return response
+
+    def import_view(self, request):
+        if not self.has_import_permission(request):
+            raise PermissionDenied
+        result = None
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = CatalogImporter(
+                    skip_invalid=form.cleaned_data['skip_invalid'], dry_run=form.cleaned_data['dry_run']
+                ).run(lambda: file_records(upload.file, upload.name))
+            except (OSError, EOFError, UnicodeDecodeError) as e:
+                form.add_error('file', f'Не удалось прочитать файл: {e}')
+        if result is not None:
+            summary = f'школ: {result.schools}, уроков: {result.lessons}, контента: {result.contents}'
+            if result.saved:
+                messages.success(request, f'Импортировано {summary}')
+            else:
+                messages.warning(request, f'Ничего не сохранено, проверено {summary}, ошибок: {len(result.errors)}')
+        return TemplateResponse(request, 'lessons/admin/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': 'Импорт школ, уроков и контента',
+            'form': form,
+            'result': result,
+            'csv_columns': CSV_COLUMNS,
+        })
@@ -5,3 +5,6 @@ class LessonsConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'lessons'
     verbose_name = 'Школа здоровья'
+
+    def ready(self):
+        from lessons import signals  # noqa: F401
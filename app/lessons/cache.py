@@ -0,0 +1,193 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from time import time_ns
+from typing import Callable, TYPE_CHECKING
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.middleware.csrf import get_token
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe, SafeString
+
+from main.release import release_fingerprint
+
+
+if TYPE_CHECKING:
+    from lessons.models import Content
+
+
+class FragmentCache:
+    """
+    Two-level cache of rendered content fragments.
+    Key includes provider, hash of text and the release, so changed content or templates never hit stale fragment,
+    invalidation only frees memory in the local layer and in the shared backend.
+    """
+    key_prefix = 'lessons:fragment'
+
+    def __init__(self, max_size: int = 1024, backend: str | None = None, timeout: int | None = None):
+        self.max_size = max_size
+        self.backend = backend
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        # key -> (content id, fragment), the id is needed to forget the key on eviction
+        self._local: OrderedDict[str, tuple[int, str]] = OrderedDict()
+        self._keys_by_content: dict[int, set[str]] = {}
+        self._lock = Lock()
+
+    @classmethod
+    def from_settings(cls) -> "FragmentCache":
+        conf = getattr(settings, 'LESSONS_FRAGMENT_CACHE', {})
+        return cls(max_size=conf.get('MAX_SIZE', 1024), backend=conf.get('BACKEND'), timeout=conf.get('TIMEOUT'))
+
+    @property
+    def shared(self):
+        return caches[self.backend] if self.backend else None
+
+    def make_key(self, content: "Content", kind: str) -> str:
+        text_hash = blake2b(content.text.encode(), digest_size=12).hexdigest()
+        return f'{self.key_prefix}:{kind}:{release_fingerprint()}:{content.id}:{content.provider}:{text_hash}'
+
+    def get_or_render(self, content: "Content", kind: str, render: Callable[[], str]) -> SafeString:
+        if content.id is None or not self.max_size:
+            return render()
+        key = self.make_key(content, kind)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                self._local.move_to_end(key)
+                self.hits += 1
+                return mark_safe(entry[1])
+        shared = self.shared
+        value = shared.get(key) if shared else None
+        if value is None:
+            value = str(render())
+            if shared:
+                shared.set(key, value, self.timeout)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+        self._store(content.id, key, value)
+        return mark_safe(value)
+
+    def _store(self, content_id: int, key: str, value: str):
+        with self._lock:
+            self._local[key] = (content_id, value)
+            self._local.move_to_end(key)
+            self._keys_by_content.setdefault(content_id, set()).add(key)
+            while len(self._local) > self.max_size:
+                old_key, (old_id, _) = self._local.popitem(last=False)
+                keys = self._keys_by_content.get(old_id)
+                if keys is not None:
+                    keys.discard(old_key)
+                    if not keys:
+                        del self._keys_by_content[old_id]
+
+    def invalidate(self, content: "Content"):
+        with self._lock:
+            keys = self._keys_by_content.pop(content.id, set())
+            for key in keys:
+                self._local.pop(key, None)
+        shared = self.shared
+        if shared:
+            keys |= {self.make_key(content, kind) for kind in ('render', 'link')}
+            shared.delete_many(list(keys))
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+            self._keys_by_content.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._local), 'max_size': self.max_size}
+
+
+fragment_cache = FragmentCache.from_settings()
+
+
+CSRF_PLACEHOLDER = 'lessons-page-cache-csrf-token'
+
+Scope = tuple[str | int, ...]
+
+
+class PageCache:
+    """
+    Full-page cache for anonymous catalog pages.
+    Page key is built from the path, the query string and version counters of every scope the page depends on,
+    bumping a counter makes all pages of that scope unreachable.
+    Per-request csrf token is rendered as CSRF_PLACEHOLDER and substituted on every response.
+    """
+    key_prefix = 'lessons:page'
+    version_prefix = 'lessons:version'
+
+    def __init__(self, enabled: bool = True, alias: str = 'default', timeout: int | None = None):
+        self.enabled = enabled
+        self.alias = alias
+        self.timeout = timeout
+
+    @classmethod
+    def from_settings(cls) -> "PageCache":
+        conf = getattr(settings, 'LESSONS_PAGE_CACHE', {})
+        return cls(enabled=conf.get('ENABLED', True), alias=conf.get('ALIAS', 'default'), timeout=conf.get('TIMEOUT'))
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, scope: Scope) -> str:
+        return ':'.join(map(str, (self.version_prefix, *scope)))
+
+    def get_versions(self, *scopes: Scope) -> list[int]:
+        keys = [self.version_key(scope) for scope in scopes]
+        found = self.cache.get_many(keys)
+        versions = []
+        for key in keys:
+            if (version := found.get(key)) is None:
+                # fresh value instead of 0, so pages stored before counter eviction stay unreachable
+                self.cache.add(key, time_ns(), None)
+                version = self.cache.get(key)
+            versions.append(version)
+        return versions
+
+    def bump(self, *scopes: Scope):
+        version = time_ns()
+        self.cache.set_many({self.version_key(scope): version for scope in scopes}, None)
+
+    @staticmethod
+    def normalize_query(query: QueryDict) -> str:
+        """Query string with parameters sorted by name, so ?a=1&b=2 and ?b=2&a=1 share a page"""
+        return urlencode(sorted(query.lists()), doseq=True)
+
+    def make_key(self, request: HttpRequest, scopes: tuple[Scope, ...]) -> str:
+        versions = '.'.join(map(str, self.get_versions(*scopes)))
+        url = f'{request.path}?{self.normalize_query(request.GET)}'
+        path_hash = blake2b(url.encode(), digest_size=12).hexdigest()
+        return f'{self.key_prefix}:{path_hash}:{versions}'
+
+    def is_cacheable(self, request: HttpRequest) -> bool:
+        if not self.enabled or request.method not in ('GET', 'HEAD'):
+            return False
+        user = getattr(request, 'user', None)
+        return not (user and user.is_authenticated and user.is_staff)
+
+    def get(self, key: str) -> bytes | None:
+        return self.cache.get(key)
+
+    def set(self, key: str, content: bytes):
+        self.cache.set(key, content, self.timeout)
+
+    @staticmethod
+    def make_response(request: HttpRequest, content: bytes) -> HttpResponse:
+        placeholder = CSRF_PLACEHOLDER.encode()
+        if placeholder in content:
+            content = content.replace(placeholder, get_token(request).encode())
+        return HttpResponse(content)
+
+
+page_cache = PageCache.from_settings()
@@ -1,8 +1,13 @@
-from typing import Any, TYPE_CHECKING, TypeVar, Type
+import re
+from functools import cache
+from pathlib import Path
+from typing import Any, Callable, Iterable, TYPE_CHECKING, TypeVar, Type
 from urllib import parse
 
+from django.conf import settings
 from django.forms.renderers import get_default_renderer
 from django.utils.functional import classproperty
+from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
 
 from lessons.html_parser import IframeParser, VKScriptParser
@@ -17,11 +22,37 @@ VIDEO = 1
 AUDIO = 2
 TEXT = 3
 
+TEMPLATES_DIR = Path(__file__).resolve().parent / 'templates'
+_variable_re = re.compile(r'{{\s*(\w+)\s*}}')
+
+
+@cache
+def compile_template(template_name: str) -> Callable[[dict[str, Any]], str]:
+    """
+    Compile app template, which contains only plain {{ variable }} tags, into auto-escaping render function.
+    Output is the same as rendering the template through forms renderer (which strips the result).
+    """
+    source = (TEMPLATES_DIR / template_name).read_text()
+    parts = _variable_re.split(source)
+    literals, names = parts[::2], parts[1::2]
+    if any(tag in literal for literal in literals for tag in ('{{', '{%', '{#')):
+        raise ValueError(f'{template_name} can`t be compiled, only plain variables are supported')
+
+    def render(context: dict[str, Any]) -> str:
+        result = [literals[0]]
+        for name, literal in zip(names, literals[1:]):
+            result.append(conditional_escape(context.get(name, '')))
+            result.append(literal)
+        return ''.join(result).strip()
+
+    return render
+
 
 class BaseContentProvider:
-    renderer = get_default_renderer()
 
     template_prefix: str = 'lessons/content/'
+    compiled: bool = False
+    compiled_render: Callable[[dict[str, Any]], str] | None = None
     _template_name: str = None
     content_type: int = None
     content_type_ru: str = None
@@ -29,15 +60,31 @@ class BaseContentProvider:
     provider_id: int = None
     provider_name: str = None
     provider_priority: int = None
+    # render a placeholder, which is replaced by the embed on click, see LESSONS_CONTENT_FACADES
+    facade: bool = False
+    facade_template_name: str = 'lessons/content/facade.html'
+    facade_class: str = ''
+    # third party scripts the embed needs (loaded with defer) and origins it connects to
+    scripts: tuple[str, ...] = ()
+    origins: tuple[str, ...] = ()
 
     instance: "Content"
 
     def __init__(self, content_instance: "Content"):
         self.instance = content_instance
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.compiled_render = staticmethod(compile_template(cls.template_name)) if cls.compiled else None
+
     def __repr__(self) -> str:
         return f'{self.content_type_ru} {self.provider_name}'
 
+    @classproperty
+    def renderer(cls):
+        # not at import, renderer loads template engines
+        return get_default_renderer()
+
     @classproperty
     def group_block_id(cls) -> str:
         return f'lesson-{cls.content_type_en}-block'
@@ -54,12 +101,42 @@ class BaseContentProvider:
     def template_name(self) -> str:
         return f'{self.template_prefix}{self._template_name or self.content_type_en}.html'
 
+    @classproperty
+    def facade_enabled(cls) -> bool:
+        return settings.LESSONS_CONTENT_FACADES.get(cls.get_choice_id(), cls.facade)
+
     def get_context(self) -> dict[str, Any]:
         return {}
 
+    def get_poster_url(self) -> str | None:
+        return None
+
     def render(self) -> str:
-        context = self.get_context()
-        return mark_safe(self.renderer.render(self.template_name, context))
+        if self.facade_enabled:
+            return self.render_facade()
+        return self.render_embed()
+
+    def render_embed(self) -> str:
+        if self.compiled_render is not None:
+            return self.render_compiled()
+        return self.render_template()
+
+    def render_facade(self) -> str:
+        return mark_safe(self.renderer.render(self.facade_template_name, {
+            'embed': self.render_embed(),
+            'poster': self.get_poster_url(),
+            'icon': self.provider_icon,
+            'provider': self.provider_name,
+            'title': self.get_title(),
+            'facade_class': self.facade_class,
+            'scripts': self.scripts,
+        }))
+
+    def render_template(self) -> str:
+        return mark_safe(self.renderer.render(self.template_name, self.get_context()))
+
+    def render_compiled(self) -> str:
+        return mark_safe(self.compiled_render(self.get_context()))
 
     def render_link(self) -> str:
         return mark_safe(
@@ -93,6 +170,11 @@ class BaseContentProvider:
             choices.append((pr.get_choice_id(), pr.get_title()))
         return tuple(choices)
 
+    @classmethod
+    def get_content_type_choices(cls) -> tuple[tuple[int, str]]:
+        choices = {pr.content_type: pr.content_type_ru.capitalize() for pr in cls.get_all_providers()}
+        return tuple(choices.items())
+
     @classmethod
     def get_providers_map(cls) -> tuple[dict[str, Type[CP]], dict[int, tuple[str, str]]]:
         pr_map, ct_map = {}, {}
@@ -110,11 +192,19 @@ class BaseVideoContentProvider(BaseContentProvider):
     content_type = VIDEO
     content_type_ru = 'видео'
     content_type_en = 'video'
+    compiled = True
+    facade = True
+    facade_class = 'lesson-video'
     video_src_pattern = None
     remote_url_pattern = None
+    # appended to video_src behind a facade, so one click starts the video
+    autoplay_query = ''
 
     def get_context(self) -> dict[str, Any]:
-        return {'video_src': self.video_src_pattern.format(self.instance.text)}
+        video_src = self.video_src_pattern.format(self.instance.text)
+        if self.facade_enabled:
+            video_src += self.autoplay_query
+        return {'video_src': video_src}
 
     def get_remote_url(self) -> str:
         return self.remote_url_pattern.format(self.instance.text)
@@ -133,6 +223,8 @@ class BaseAudioContentProvider(BaseContentProvider):
     content_type: int = AUDIO
     content_type_ru = 'аудио'
     content_type_en = 'audio'
+    facade = True
+    facade_class = 'lesson-audio'
 
 
 class BaseTextContentProvider(BaseContentProvider):
@@ -144,8 +236,10 @@ class BaseTextContentProvider(BaseContentProvider):
 class VKVideoContentProvider(BaseVideoContentProvider):
     provider_id = 1
     provider_name = 'VK'
+    origins = ('https://vk.com', )
     video_src_pattern = 'https://vk.com/video_ext.php?{}'
     remote_url_pattern = 'https://vk.com/video{}'
+    autoplay_query = '&autoplay=1'
 
     def get_remote_url(self) -> str:
         data = self.get_query_data()
@@ -161,8 +255,14 @@ class VKVideoContentProvider(BaseVideoContentProvider):
 class YouTubeVideoContentProvider(BaseVideoContentProvider):
     provider_id = 2
     provider_name = 'YouTube'
+    origins = ('https://www.youtube.com', 'https://i.ytimg.com')
     video_src_pattern = 'https://www.youtube.com/embed/{}'
     remote_url_pattern = 'https://www.youtube.com/watch?v={}'
+    poster_url_pattern = 'https://i.ytimg.com/vi/{}/hqdefault.jpg'
+    autoplay_query = '?autoplay=1'
+
+    def get_poster_url(self) -> str | None:
+        return self.poster_url_pattern.format(self.instance.text)
 
     def finish_modify_data(self, parser: IframeParser):
         self.instance.text = parser.get_src().path.rpartition('/')[2]
@@ -171,6 +271,7 @@ class YouTubeVideoContentProvider(BaseVideoContentProvider):
 class RuTubeVideoContentProvider(BaseVideoContentProvider):
     provider_id = 3
     provider_name = 'RuTube'
+    origins = ('https://rutube.ru', )
     video_src_pattern = 'https://rutube.ru/play/embed/{}'
     remote_url_pattern = 'https://rutube.ru/video/{}/'
 
@@ -182,6 +283,9 @@ class VKAudioContentProvider(BaseAudioContentProvider):
     provider_id = 1
     provider_name = 'VK'
     _template_name = 'audio-vk'
+    compiled = True
+    scripts = ('https://vk.com/js/api/openapi.js?169', )
+    origins = ('https://vk.com', )
     remote_url_pattern = 'https://vk.com/podcast{}'
     # provider_priority = 3
 
@@ -211,6 +315,8 @@ class YandexAudioContentProvider(BaseAudioContentProvider):
     provider_id = 2
     provider_name = 'Yandex'
     _template_name = 'audio-yandex'
+    compiled = True
+    origins = ('https://music.yandex.ru', )
     audio_src_pattern = 'https://music.yandex.ru/iframe/#track/{}/{}'
     remote_url_pattern = 'https://music.yandex.ru/album/{}/track/{}'
 
@@ -244,4 +350,23 @@ class SimpleTextContentProvider(BaseTextContentProvider):
         return {'text': self.instance.text}
 
 
+def collect_assets(providers: Iterable[Type[BaseContentProvider]]) -> dict[str, list[str]]:
+    """
+    Scripts and resource hints of rendered providers. Embeds behind facades load their scripts on click,
+    see render_facade, their origins get only dns-prefetch.
+    """
+    scripts, preconnect, dns_prefetch = {}, {}, {}
+    for provider in providers:
+        if provider.facade_enabled:
+            dns_prefetch.update(dict.fromkeys(provider.origins))
+        else:
+            scripts.update(dict.fromkeys(provider.scripts))
+            preconnect.update(dict.fromkeys(provider.origins))
+    return {
+        'scripts': list(scripts),
+        'preconnect': list(preconnect),
+        'dns_prefetch': [origin for origin in dns_prefetch if origin not in preconnect],
+    }
+
+
 providers_map, content_types_map = BaseContentProvider.get_providers_map()
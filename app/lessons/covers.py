@@ -0,0 +1,101 @@
+"""
+Responsive variants of School and Lesson covers.
+
+Variants are stored next to MEDIA_ROOT/<cover dir>/variants and described by the cover_variants field:
+{'name': cover name, 'source': hash of cover file, 'spec': hash of COVER_VARIANTS,
+ 'width': ..., 'height': ..., 'variants': {'webp': [[width, height, name], ...], 'jpeg': [...]}}
+"""
+import json
+import os
+from hashlib import blake2b
+from pathlib import PurePosixPath
+from typing import Any
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Model
+from PIL import Image, UnidentifiedImageError
+
+
+FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+
+
+def spec_hash() -> str:
+    return blake2b(json.dumps(settings.COVER_VARIANTS, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+def source_hash(name: str) -> str:
+    digest = blake2b(digest_size=16)
+    with default_storage.open(name, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def variant_name(name: str, width: int, fmt: str) -> str:
+    path = PurePosixPath(name)
+    return str(path.parent / 'variants' / f'{path.stem}-{width}.{fmt}')
+
+
+def save_atomic(image: Image.Image, name: str, fmt: str):
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(tmp, FORMATS[fmt][0], quality=settings.COVER_VARIANTS['QUALITY'], optimize=True)
+    os.replace(tmp, path)
+
+
+def build_variants(name: str, digest: str | None = None) -> dict[str, Any]:
+    """Render every configured variant of the cover file, returns cover_variants record"""
+    record = {'name': name, 'source': digest, 'spec': spec_hash(), 'variants': {}}
+    try:
+        record['source'] = digest or source_hash(name)
+        with default_storage.open(name, 'rb') as file, Image.open(file) as image:
+            image.load()
+            record['width'], record['height'] = image.size
+            widths = [w for w in settings.COVER_VARIANTS['WIDTHS'] if w < image.width] or [image.width]
+            for fmt in settings.COVER_VARIANTS['FORMATS']:
+                rendered = record['variants'][fmt] = []
+                for width in widths:
+                    height = round(image.height * width / image.width)
+                    variant = variant_name(name, width, fmt)
+                    save_atomic(image.resize((width, height), Image.LANCZOS), variant, fmt)
+                    rendered.append([width, height, variant])
+    except (UnidentifiedImageError, OSError):
+        # svg, broken or missing file, templates use the original
+        record['variants'] = {}
+    return record
+
+
+def is_fresh(record: dict[str, Any], name: str) -> bool:
+    return bool(record) and record.get('name') == name and record.get('spec') == spec_hash()
+
+
+def ensure_variants(instance: Model) -> dict[str, Any]:
+    """Variants of instance.cover, built and saved if they are missing or outdated"""
+    name = instance.cover.name
+    if not name:
+        return {}
+    record = instance.cover_variants
+    if not is_fresh(record, name):
+        record = build_variants(name)
+        type(instance).objects.filter(pk=instance.pk).update(cover_variants=record)
+        instance.cover_variants = record
+    return record
+
+
+def rebuild_cover(name: str, record: dict[str, Any], force: bool = False) -> dict[str, Any] | None:
+    """New cover_variants record, None if the source file and COVER_VARIANTS didn't change since the last build"""
+    try:
+        digest = source_hash(name)
+    except OSError:
+        digest = None
+    unchanged = (
+        digest and record.get('source') == digest and record.get('spec') == spec_hash()
+        and all(default_storage.exists(v[2]) for rendered in record.get('variants', {}).values() for v in rendered)
+    )
+    if unchanged and not force:
+        return None
+    return build_variants(name, digest)
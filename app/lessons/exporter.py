@@ -0,0 +1,67 @@
+"""
+Catalog export in the lessons.importer ndjson format.
+
+Rows are read with values() through server-side cursors and written as they come,
+so memory doesn't depend on the catalog size.
+"""
+import json
+import zlib
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from django.db import connection, transaction
+
+from lessons.models import School, Lesson, Content
+
+
+SCHOOL_VALUES = {'slug': 'slug', 'position': 'position', 'title': 'title', 'cover': 'cover',
+                 'cower_w': 'cower_w', 'cower_h': 'cower_h'}
+LESSON_VALUES = {'school': 'school__slug', 'slug': 'slug', 'position': 'position', 'title': 'title',
+                 'description': 'description', 'cover': 'cover', 'cower_w': 'cower_w', 'cower_h': 'cower_h'}
+CONTENT_VALUES = {'lesson': 'lesson__slug', 'provider': 'provider', 'text': 'text'}
+
+
+@contextmanager
+def snapshot():
+    """Schools, lessons and contents are read by separate queries, they must see the same data"""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        yield
+
+
+def catalog_records(chunk_size: int = 2000) -> Iterator[dict[str, Any]]:
+    """Schools, then lessons, then contents, so every record references already exported ones"""
+    querysets = (
+        ('school', School.objects.order_by('id'), SCHOOL_VALUES),
+        ('lesson', Lesson.objects.order_by('id'), LESSON_VALUES),
+        ('content', Content.objects.order_by('id'), CONTENT_VALUES),
+    )
+    with snapshot():
+        for type, queryset, values in querysets:
+            keys = tuple(values)
+            for row in queryset.values_list(*values.values()).iterator(chunk_size=chunk_size):
+                yield {'type': type, **dict(zip(keys, row))}
+
+
+def ndjson_chunks(chunk_size: int = 2000, compress: bool = False) -> Iterator[bytes]:
+    """Encoded export, a chunk per chunk_size records"""
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    # wbits=31 writes gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    lines = []
+    for record in catalog_records(chunk_size):
+        lines.append(encoder.encode(record))
+        if len(lines) >= chunk_size:
+            data = '\n'.join(lines).encode() + b'\n'
+            lines.clear()
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    data = '\n'.join(lines).encode() + b'\n' if lines else b''
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
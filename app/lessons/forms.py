@@ -0,0 +1,7 @@
+from django import forms
+
+
+class CatalogImportForm(forms.Form):
+    file = forms.FileField(label='Файл', help_text='.ndjson или .csv, можно сжатый gzip (.gz)')
+    skip_invalid = forms.BooleanField(label='Сохранить корректные строки, если есть ошибки', required=False)
+    dry_run = forms.BooleanField(label='Только проверить', required=False)
@@ -0,0 +1,320 @@
+"""
+Bulk import of schools, lessons and contents.
+
+Records (ndjson - one object per line, csv - see csv_records):
+    {"type": "school", "slug": ..., "position": ..., "title": ...}
+    {"type": "lesson", "school": <school slug>, "slug": ..., "position": ..., "title": ..., "description": ...}
+    {"type": "content", "lesson": <lesson slug>, "provider": "1,2", "text": <embed code as pasted into admin>}
+Schools and lessons may also have "cover", "cower_w" and "cower_h" (name of a file in MEDIA_ROOT and its size).
+Schools and lessons may be referenced by slug if they already exist. Other keys are ignored.
+Files written by export_catalog (see lessons.exporter) are imported as they are.
+"""
+import csv
+import gzip
+import io
+import json
+from contextlib import nullcontext
+from multiprocessing import get_context
+from typing import Any, Callable, IO, Iterable, Iterator, NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from lessons.cache import page_cache, Scope
+from lessons.content_providers import providers_map
+from lessons.models import School, Lesson, Content
+from lessons.signals import school_scopes, lesson_scopes
+
+
+# cover sizes are exported with the cover name, so ImageField doesn't open the file to get them
+SCHOOL_FIELDS = ('position', 'title', 'slug', 'cover', 'cower_w', 'cower_h')
+LESSON_FIELDS = ('position', 'title', 'slug', 'description', 'cover', 'cower_w', 'cower_h')
+CSV_COLUMNS = (
+    'school', 'school_position', 'school_title',
+    'lesson', 'lesson_position', 'lesson_title', 'lesson_description',
+    'provider', 'text',
+)
+
+
+class RowError(NamedTuple):
+    line: int
+    type: str
+    key: str
+    message: str
+
+
+class ImportResult(NamedTuple):
+    schools: int
+    lessons: int
+    contents: int
+    errors: list[RowError]
+    saved: bool
+
+
+def ndjson_records(file: IO[str]) -> Iterator[tuple[int, dict[str, Any]]]:
+    for line, text in enumerate(file, 1):
+        if text.strip():
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as e:
+                yield line, {'type': 'invalid', 'error': f'Неверный JSON: {e}'}
+
+
+def csv_records(file: IO[str]) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Row per content, school and lesson columns are needed only in the first row of the school or lesson"""
+    for line, row in enumerate(csv.DictReader(file), 2):
+        if row.get('school_title'):
+            yield line, {'type': 'school', 'slug': row['school'], 'position': row['school_position'],
+                         'title': row['school_title']}
+        if row.get('lesson_title'):
+            yield line, {'type': 'lesson', 'school': row['school'], 'slug': row['lesson'],
+                         'position': row['lesson_position'], 'title': row['lesson_title'],
+                         'description': row.get('lesson_description', '')}
+        if row.get('provider'):
+            yield line, {'type': 'content', 'lesson': row['lesson'], 'provider': row['provider'], 'text': row['text']}
+
+
+def file_records(file: IO[bytes], name: str, format: str | None = None) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    Records of an uploaded or opened file from its start, gzipped if name ends with .gz, format by extension
+    by default. The file is left open, so it can be read again, see CatalogImporter.run.
+    """
+    file.seek(0)
+    if name.endswith('.gz'):
+        file, name = gzip.GzipFile(fileobj=file), name[:-3]
+    stream = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    format = format or ('csv' if name.endswith('.csv') else 'ndjson')
+    try:
+        yield from csv_records(stream) if format == 'csv' else ndjson_records(stream)
+    finally:
+        # closing the wrapper would close the file
+        stream.detach()
+
+
+def parse_embed(args: tuple[str, str]) -> tuple[str, str | None]:
+    """Provider modify_data of the pasted embed code, as Content.clean() does in admin"""
+    provider, text = args
+    content = Content(provider=provider, text=text)
+    try:
+        content.get_renderer().modify_data()
+    except Exception as e:
+        return text, f'Не удалось разобрать код вставки: {e}'
+    return content.text, None
+
+
+def validation_message(error: ValidationError) -> str:
+    if hasattr(error, 'error_dict'):
+        return '; '.join(f'{field}: {" ".join(messages)}' for field, messages in error.message_dict.items())
+    return ' '.join(error.messages)
+
+
+class CatalogImporter:
+    """
+    Reads records twice in one transaction: schools and lessons are validated and written first,
+    then contents are parsed, validated and written in batches, so memory doesn't depend on their number.
+    The transaction is rolled back on dry run and on errors, unless skip_invalid.
+    """
+
+    def __init__(self, workers: int = 1, batch_size: int = 500, skip_invalid: bool = False, dry_run: bool = False):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.skip_invalid = skip_invalid
+        self.dry_run = dry_run
+        self.errors: list[RowError] = []
+        self.schools: dict[str, School] = {}
+        self.lessons: dict[str, Lesson] = {}
+        self.contents = 0
+        # lessons which got contents and their page cache scopes
+        self.content_lesson_ids: set[int] = set()
+        self.content_scopes: set[Scope] = set()
+        self.pool = None
+
+    def error(self, line: int, type: str, key: Any, message: str):
+        self.errors.append(RowError(line, type, str(key), message))
+
+    def run(self, read_records: Callable[[], Iterable[tuple[int, dict[str, Any]]]]) -> ImportResult:
+        """read_records returns the records from the start on every call"""
+        if self.workers > 1:
+            # forked workers must open their own connections, so the pool is started before the transaction
+            connections.close_all()
+            self.pool = get_context('fork').Pool(self.workers)
+        with self.pool or nullcontext(), transaction.atomic():
+            self.import_schools_and_lessons(read_records())
+            self.import_contents(read_records())
+            saved = not self.dry_run and (self.skip_invalid or not self.errors)
+            if saved:
+                self.touch_existing()
+                Lesson.objects.filter(
+                    pk__in={lesson.id for lesson in self.lessons.values()} | self.content_lesson_ids
+                ).update_search_vector()
+            else:
+                transaction.set_rollback(True)
+        self.pool = None
+        if saved:
+            self.bump_pages()
+        self.errors.sort()
+        return ImportResult(len(self.schools), len(self.lessons), self.contents, self.errors, saved)
+
+    def import_schools_and_lessons(self, records: Iterable[tuple[int, dict[str, Any]]]):
+        schools, lessons = [], []
+        for line, record in records:
+            match record.get('type'):
+                case 'school':
+                    schools.append((line, record))
+                case 'lesson':
+                    lessons.append((line, record))
+                case 'content':
+                    pass
+                case 'invalid':
+                    self.error(line, '', '', record['error'])
+                case other:
+                    self.error(line, str(other), '', 'Неизвестный тип записи')
+
+        for start in range(0, len(schools), self.batch_size):
+            self.validate_schools(schools[start:start + self.batch_size])
+        for start in range(0, len(lessons), self.batch_size):
+            self.validate_lessons(lessons[start:start + self.batch_size])
+        # bulk_create sets pks, foreign keys of the next level are taken from them
+        School.objects.bulk_create(self.schools.values(), batch_size=self.batch_size)
+        Lesson.objects.bulk_create(self.lessons.values(), batch_size=self.batch_size)
+
+    def import_contents(self, records: Iterable[tuple[int, dict[str, Any]]]):
+        batch = []
+        for line, record in records:
+            if record.get('type') == 'content':
+                batch.append((line, record))
+                if len(batch) >= self.batch_size:
+                    self.save_contents(self.validate_contents(self.parse_embeds(batch)))
+                    batch = []
+        if batch:
+            self.save_contents(self.validate_contents(self.parse_embeds(batch)))
+
+    @staticmethod
+    def school_keys(school: School) -> list[tuple[str, Any]]:
+        return [('slug', school.slug), ('title', school.title), ('position', school.position)]
+
+    def validate_schools(self, rows: list[tuple[int, dict[str, Any]]]):
+        existing = School.objects.filter(
+            Q(slug__in=[r.get('slug') for _, r in rows]) | Q(title__in=[r.get('title') for _, r in rows])
+            | Q(position__in=[r.get('position') for _, r in rows if str(r.get('position', '')).isdigit()])
+        ).values_list('slug', 'title', 'position')
+        taken = {pair for row in existing for pair in zip(('slug', 'title', 'position'), row)}
+        taken.update(pair for school in self.schools.values() for pair in self.school_keys(school))
+        for line, record in rows:
+            school = School(**{field: record[field] for field in SCHOOL_FIELDS if field in record})
+            try:
+                # cleaning an ImageField assigns it again, which reads image sizes from the file
+                school.full_clean(exclude=('cover', ), validate_unique=False)
+            except ValidationError as e:
+                self.error(line, 'school', record.get('slug'), validation_message(e))
+                continue
+            if duplicates := [f'{field} {value}' for field, value in self.school_keys(school) if (field, value) in taken]:
+                self.error(line, 'school', school.slug, f'Уже существует: {", ".join(duplicates)}')
+                continue
+            taken.update(self.school_keys(school))
+            self.schools[school.slug] = school
+
+    def validate_lessons(self, rows: list[tuple[int, dict[str, Any]]]):
+        existing_schools = School.objects.in_bulk(
+            {r.get('school') for _, r in rows} - set(self.schools), field_name='slug'
+        )
+        existing = Lesson.objects.filter(
+            Q(slug__in=[r.get('slug') for _, r in rows]) | Q(school__slug__in=existing_schools)
+        ).values_list('slug', 'school__slug', 'position')
+        taken = {slug for slug, *_ in existing} | set(self.lessons)
+        positions = {(school, position) for _, school, position in existing} | {
+            (lesson.school.slug, lesson.position) for lesson in self.lessons.values()
+        }
+        for line, record in rows:
+            school = self.schools.get(record.get('school')) or existing_schools.get(record.get('school'))
+            if school is None:
+                self.error(line, 'lesson', record.get('slug'), f'Нет школы {record.get("school")}')
+                continue
+            lesson = Lesson(school=school, **{field: record[field] for field in LESSON_FIELDS if field in record})
+            try:
+                lesson.full_clean(exclude=('school', 'cover'), validate_unique=False)
+            except ValidationError as e:
+                self.error(line, 'lesson', record.get('slug'), validation_message(e))
+                continue
+            if lesson.slug in taken:
+                self.error(line, 'lesson', lesson.slug, 'Урок с таким синонимом уже существует')
+                continue
+            if (school.slug, lesson.position) in positions:
+                self.error(line, 'lesson', lesson.slug, f'В школе {school.slug} уже есть урок {lesson.position}')
+                continue
+            taken.add(lesson.slug)
+            positions.add((school.slug, lesson.position))
+            self.lessons[lesson.slug] = lesson
+
+    def parse_embeds(self, rows: list[tuple[int, dict[str, Any]]]) -> list[tuple[int, dict[str, Any]]]:
+        valid = []
+        for line, record in rows:
+            if record.get('provider') not in providers_map:
+                self.error(line, 'content', record.get('lesson'), f'Неизвестный тип контента {record.get("provider")}')
+            else:
+                valid.append((line, record))
+        jobs = [(record['provider'], record.get('text') or '') for _, record in valid]
+        if self.pool and len(jobs) > 1:
+            results = self.pool.map(parse_embed, jobs, chunksize=max(1, len(jobs) // (self.workers * 4)))
+        else:
+            results = list(map(parse_embed, jobs))
+
+        parsed = []
+        for (line, record), (text, error) in zip(valid, results):
+            if error:
+                self.error(line, 'content', record.get('lesson'), error)
+            else:
+                parsed.append((line, {**record, 'text': text}))
+        return parsed
+
+    def validate_contents(self, rows: list[tuple[int, dict[str, Any]]]) -> list[Content]:
+        """Contents of earlier batches are already written, duplicates of them are found in the database"""
+        slugs = {r.get('lesson') for _, r in rows}
+        lessons = {slug: self.lessons[slug] for slug in slugs if slug in self.lessons}
+        lessons.update(Lesson.objects.select_related('school').in_bulk(slugs - set(lessons), field_name='slug'))
+        taken = set(Content.objects.filter(lesson__in=lessons.values()).values_list('lesson__slug', 'provider'))
+        contents = []
+        for line, record in rows:
+            lesson = lessons.get(record.get('lesson'))
+            if lesson is None:
+                self.error(line, 'content', record.get('lesson'), f'Нет урока {record.get("lesson")}')
+                continue
+            content = Content(lesson=lesson, provider=record['provider'], text=record['text'])
+            content.sync_provider_fields()
+            try:
+                content.clean_fields(exclude=('lesson', ))
+            except ValidationError as e:
+                self.error(line, 'content', lesson.slug, validation_message(e))
+                continue
+            if (lesson.slug, content.provider) in taken:
+                self.error(line, 'content', lesson.slug, f'В уроке уже есть {content.get_renderer().get_title()}')
+                continue
+            taken.add((lesson.slug, content.provider))
+            contents.append(content)
+        return contents
+
+    def save_contents(self, contents: list[Content]):
+        Content.objects.bulk_create(contents, batch_size=self.batch_size)
+        self.contents += len(contents)
+        for content in contents:
+            self.content_lesson_ids.add(content.lesson_id)
+            self.content_scopes.update(lesson_scopes(content.lesson.school.slug, content.lesson.position))
+
+    def touch_existing(self):
+        """bulk_create doesn't send signals, see lessons.signals"""
+        now = timezone.now()
+        lesson_ids = self.content_lesson_ids - {lesson.id for lesson in self.lessons.values()}
+        school_ids = {lesson.school_id for lesson in self.lessons.values()} - {school.id for school in self.schools.values()}
+        Lesson.objects.filter(pk__in=lesson_ids).update(updated_at=now)
+        School.objects.filter(Q(pk__in=school_ids) | Q(lessons__in=lesson_ids)).update(updated_at=now)
+
+    def bump_pages(self):
+        scopes = set(self.content_scopes)
+        for school in self.schools.values():
+            scopes.update(school_scopes(school.slug))
+        for lesson in self.lessons.values():
+            scopes.update(lesson_scopes(lesson.school.slug, lesson.position))
+        page_cache.bump(*scopes)
+
@@ -0,0 +1,60 @@
+import tracemalloc
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from lessons.models import Lesson
+
+
+def fetch_prefetch(filters: dict) -> Lesson:
+    lesson = Lesson.objects.select_related('school').prefetch_related('contents').get(**filters)
+    lesson.get_available_content_types()
+    return lesson
+
+
+def fetch_json(filters: dict) -> Lesson:
+    lesson = Lesson.objects.with_contents_json().get(**filters)
+    lesson.use_contents_json()
+    lesson.get_available_content_types()
+    return lesson
+
+
+class Command(BaseCommand):
+    help = 'Compare latency, queries and allocations of lesson page fetch modes (PostgreSQL only)'
+    modes = {'prefetch': fetch_prefetch, 'json': fetch_json}
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lesson', type=int, help='lesson id, lesson with most contents by default')
+        parser.add_argument('-n', '--number', type=int, default=500, help='fetches per mode')
+
+    def handle(self, *args, lesson: int | None, number: int, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('json fetch mode requires PostgreSQL')
+        if lesson is None:
+            lesson = Lesson.objects.annotate(n=Count('contents')).order_by('-n').values_list('id', flat=True).first()
+        if lesson is None:
+            raise CommandError('No lessons to fetch')
+        obj = Lesson.objects.select_related('school').get(pk=lesson)
+        filters = {'school__slug': obj.school.slug, 'position': obj.position}
+
+        self.stdout.write(f'{"mode":<10}{"queries":>9}{"ms/fetch":>11}{"peak KiB":>11}{"retained KiB":>13}')
+        for name, fetch in self.modes.items():
+            fetch(filters)
+            with CaptureQueriesContext(connection) as queries:
+                fetch(filters)
+
+            start = perf_counter()
+            for _ in range(number):
+                fetch(filters)
+            elapsed = (perf_counter() - start) / number * 1000
+
+            tracemalloc.start()
+            result = fetch(filters)
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del result
+
+            self.stdout.write(f'{name:<10}{len(queries):>9}{elapsed:>11.3f}{peak / 1024:>11.1f}{retained / 1024:>13.1f}')
@@ -0,0 +1,46 @@
+from timeit import Timer
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lessons.content_providers import providers_map
+from lessons.models import Content
+
+
+SAMPLE_TEXTS = {
+    '1,1': 'oid=-123&id=456&hash=a1b2"c3',
+    '1,2': 'dQw4w9WgXcQ',
+    '1,3': "c6cc4d620b1d4338901770a44b3e82f4'",
+    '2,1': '-147845620_456239017,d0a7<b>3f',
+    '2,2': '10880796,2138393',
+    '3,1': 'Текст & <разметка>',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare template and compiled render paths of every content provider'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--number', type=int, default=10000, help='renders per measurement')
+        parser.add_argument('-r', '--repeat', type=int, default=5, help='measurements, best is reported')
+
+    def handle(self, *args, number: int, repeat: int, **options):
+        self.stdout.write(f'{"provider":<16}{"template, us":>14}{"compiled, us":>14}{"speedup":>10}')
+        mismatched = []
+        for choice_id, provider_class in providers_map.items():
+            provider = provider_class(Content(provider=choice_id, text=SAMPLE_TEXTS.get(choice_id, 'sample')))
+            template_cost = self.measure(provider.render_template, number, repeat)
+            if provider.compiled_render is None:
+                self.stdout.write(f'{choice_id:<16}{template_cost:>14.2f}{"-":>14}{"-":>10}')
+                continue
+            if provider.render_template() != provider.render_compiled():
+                mismatched.append(choice_id)
+            compiled_cost = self.measure(provider.render_compiled, number, repeat)
+            self.stdout.write(
+                f'{choice_id:<16}{template_cost:>14.2f}{compiled_cost:>14.2f}{template_cost / compiled_cost:>9.1f}x'
+            )
+        if mismatched:
+            raise CommandError(f'Compiled output differs from template output: {", ".join(mismatched)}')
+
+    @staticmethod
+    def measure(func, number: int, repeat: int) -> float:
+        return min(Timer(func).repeat(repeat=repeat, number=number)) / number * 1_000_000
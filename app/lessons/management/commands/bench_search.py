@@ -0,0 +1,70 @@
+from random import Random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from lessons.models import School, Lesson, Content
+
+
+WORDS = (
+    'осанка спина шея плечи поясница суставы колени стопы дыхание сон питание вода сахар давление сердце '
+    'сосуды зрение глаза мышцы растяжка зарядка прогулка стресс тревога память внимание иммунитет витамины '
+    'белок клетчатка завтрак ужин ходьба плавание йога массаж боль усталость отдых режим гимнастика'
+).split()
+QUERIES = ('осанка', 'боли в спине', 'дыхание -йога', '"утренняя зарядка"', 'витамины OR белок', 'несуществующее')
+
+
+class Command(BaseCommand):
+    help = 'Measure lesson search latency on a large generated catalog, rolled back afterwards (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lessons', type=int, default=100_000, help='lessons to generate')
+        parser.add_argument('-n', '--number', type=int, default=200, help='searches per query')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, lessons: int, number: int, batch_size: int, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Search requires PostgreSQL')
+        with transaction.atomic():
+            self.populate(lessons, batch_size)
+            self.stdout.write(f'{"query":<22}{"found":>7}{"ms/search":>11}')
+            for query in QUERIES:
+                found = len(Lesson.objects.search(query))
+                start = perf_counter()
+                for _ in range(number):
+                    list(Lesson.objects.search(query).select_related('school'))
+                elapsed = (perf_counter() - start) / number * 1000
+                self.stdout.write(f'{query:<22}{found:>7}{elapsed:>11.3f}')
+            plan = Lesson.objects.search(QUERIES[1]).select_related('school').explain(analyze=True)
+            self.stdout.write(f'\n{QUERIES[1]} plan:\n{plan}')
+            transaction.set_rollback(True)
+
+    def populate(self, lessons: int, batch_size: int):
+        random = Random(0)
+        start = perf_counter()
+        schools = School.objects.bulk_create(
+            School(position=-i, title=f'bench {i}', slug=f'bench-{i}') for i in range(1, lessons // 1000 + 2)
+        )
+        for offset in range(0, lessons, batch_size):
+            created = Lesson.objects.bulk_create(
+                Lesson(
+                    school=schools[i // 1000], position=i % 1000 + 1, slug=f'bench-{i}',
+                    title=' '.join(random.choices(WORDS, k=3)), description=' '.join(random.choices(WORDS, k=30)),
+                )
+                for i in range(offset, min(offset + batch_size, lessons))
+            )
+            contents = [
+                Content(lesson=lesson, provider='3,1', text=' '.join(random.choices(WORDS, k=200))) for lesson in created
+            ]
+            for content in contents:
+                content.sync_provider_fields()
+            Content.objects.bulk_create(contents)
+            Lesson.objects.filter(pk__in=[lesson.pk for lesson in created]).update_search_vector()
+        with connection.cursor() as cursor:
+            # bulk inserted rows wait in GIN pending lists, vacuum merges them in production
+            for index in Lesson._meta.indexes:
+                cursor.execute('SELECT gin_clean_pending_list(%s::regclass)', [index.name])
+            for model in (Lesson, Content):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        self.stdout.write(f'Generated {lessons} lessons in {perf_counter() - start:.1f}s')
@@ -0,0 +1,39 @@
+import os
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from lessons.exporter import ndjson_chunks
+
+
+class Command(BaseCommand):
+    help = (
+        'Write schools, lessons and contents as ndjson, which import_lessons reads back. '
+        'Gzipped if the file name ends with .gz or with --gzip.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=Path, nargs='?', help='stdout by default')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='rows fetched from the cursor at once')
+
+    def handle(self, *args, file: Path | None, gzip: bool, chunk_size: int, **options):
+        compress = gzip or bool(file and file.suffix == '.gz')
+        start = perf_counter()
+        size = 0
+        # a failed export doesn't replace the previous one
+        tmp = file.with_name(f'.{file.name}.{os.getpid()}.tmp') if file else None
+        with (tmp.open('wb') if tmp else open(sys.stdout.fileno(), 'wb', closefd=False)) as stream:
+            try:
+                for chunk in ndjson_chunks(chunk_size, compress):
+                    stream.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                if tmp:
+                    tmp.unlink()
+                raise
+        if file:
+            os.replace(tmp, file)
+            self.stdout.write(self.style.SUCCESS(f'{size} bytes written to {file} in {perf_counter() - start:.2f}s'))
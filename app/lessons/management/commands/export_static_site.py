@@ -0,0 +1,31 @@
+import os
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from lessons.static_site import StaticSiteExporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Render school list, school and lesson pages to <target>/<url>/index.html. '
+        'Only pages whose schools, lessons or contents changed since the last export are rendered again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', type=Path, help='output directory, e.g. served by nginx with try_files')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='rendering processes')
+        parser.add_argument('--force', action='store_true', help='ignore manifest and render all pages')
+        parser.add_argument('--host', help='host of the rendered requests, the first of ALLOWED_HOSTS by default')
+
+    def handle(self, *args, target: Path, workers: int, force: bool, host: str | None, **options):
+        start = perf_counter()
+        rendered, removed = StaticSiteExporter(target, workers=workers, force=force, host=host).export()
+        for path in sorted(rendered):
+            self.stdout.write(f'rendered {path}')
+        for path in sorted(removed):
+            self.stdout.write(f'removed {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(rendered)} rendered, {len(removed)} removed in {perf_counter() - start:.2f}s'
+        ))
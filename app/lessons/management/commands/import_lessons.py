@@ -0,0 +1,44 @@
+import os
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lessons.importer import CatalogImporter, CSV_COLUMNS, file_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Import schools, lessons and contents from ndjson (see lessons.importer, export_catalog writes it) or csv '
+        f'(columns: {", ".join(CSV_COLUMNS)}), optionally gzipped. '
+        'Nothing is saved if any row is invalid, unless --skip-invalid.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=Path)
+        parser.add_argument('--format', choices=('ndjson', 'csv'), help='by file extension (before .gz) by default')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='embed parsing processes')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--skip-invalid', action='store_true', help='save valid rows even if some are invalid')
+        parser.add_argument('--dry-run', action='store_true', help='only validate')
+
+    def handle(self, *args, file: Path, format: str | None, workers: int, batch_size: int, skip_invalid: bool,
+               dry_run: bool, **options):
+        importer = CatalogImporter(workers=workers, batch_size=batch_size, skip_invalid=skip_invalid, dry_run=dry_run)
+        start = perf_counter()
+        try:
+            with file.open('rb') as stream:
+                result = importer.run(lambda: file_records(stream, file.name, format))
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            raise CommandError(e)
+
+        for error in result.errors:
+            self.stderr.write(f'{file.name}:{error.line} {error.type} {error.key}: {error.message}')
+        summary = (
+            f'{result.schools} schools, {result.lessons} lessons, {result.contents} contents, '
+            f'{len(result.errors)} errors in {perf_counter() - start:.2f}s'
+        )
+        if result.saved:
+            self.stdout.write(self.style.SUCCESS(f'Imported {summary}'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Nothing saved: {summary}'))
@@ -0,0 +1,78 @@
+import os
+from multiprocessing import get_context
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from lessons.cache import page_cache
+from lessons.covers import rebuild_cover
+from lessons.models import School, Lesson
+from lessons.signals import school_scopes, lesson_scopes
+
+
+def _rebuild_job(args: tuple[int, str, dict, bool]) -> tuple[int, dict | None]:
+    pk, name, record, force = args
+    return pk, rebuild_cover(name, record, force)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild cover variants of all schools and lessons after COVER_VARIANTS change. '
+        'Covers whose file and settings didn\'t change since the last build are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='image processes')
+        parser.add_argument('--batch-size', type=int, default=200, help='rows per bulk update')
+        parser.add_argument('--force', action='store_true', help='rebuild covers with unchanged hashes too')
+
+    def handle(self, *args, workers: int, batch_size: int, force: bool, **options):
+        start = perf_counter()
+        self.processed = self.rebuilt = 0
+        # forked workers must open their own connections
+        connections.close_all()
+        with get_context('fork').Pool(workers) as pool:
+            self.rebuild(pool, School.objects.all(), batch_size, force, lambda obj: school_scopes(obj.slug))
+            self.rebuild(
+                pool, Lesson.objects.select_related('school'), batch_size, force,
+                lambda obj: lesson_scopes(obj.school.slug, obj.position)
+            )
+        elapsed = perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.processed} covers, {self.rebuilt} rebuilt in {elapsed:.2f}s ({self.processed / elapsed:.1f}/s)'
+        ))
+
+    def rebuild(self, pool, queryset, batch_size: int, force: bool, get_scopes):
+        queryset = queryset.exclude(cover='').order_by('pk')
+        model = queryset.model
+        total = queryset.count()
+        rows = queryset.values_list('pk', 'cover', 'cover_variants').iterator(chunk_size=batch_size)
+        jobs = ((pk, name, record, force) for pk, name, record in rows)
+
+        changed = {}
+        for done, (pk, record) in enumerate(pool.imap_unordered(_rebuild_job, jobs, chunksize=4), 1):
+            self.processed += 1
+            if record is not None:
+                changed[pk] = record
+            if len(changed) >= batch_size:
+                self.save(queryset, changed, get_scopes)
+            if done % batch_size == 0 or done == total:
+                self.stdout.write(f'{model._meta.model_name}: {done}/{total}')
+        self.save(queryset, changed, get_scopes)
+
+    def save(self, queryset, changed: dict[int, dict], get_scopes):
+        if not changed:
+            return
+        now = timezone.now()
+        objects = list(queryset.filter(pk__in=changed))
+        for obj in objects:
+            record = obj.cover_variants = changed[obj.pk]
+            obj.cower_w, obj.cower_h = record.get('width', obj.cower_w), record.get('height', obj.cower_h)
+            # conditional GET of catalog pages depends on updated_at
+            obj.updated_at = now
+        queryset.model.objects.bulk_update(objects, ('cover_variants', 'cower_w', 'cower_h', 'updated_at'))
+        page_cache.bump(*{scope for obj in objects for scope in get_scopes(obj)})
+        self.rebuilt += len(objects)
+        changed.clear()
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import JSONBAgg, StringAgg
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Concat, JSONObject, Left
+from django.db.models.manager import BaseManager
+
+from lessons.content_providers import TEXT
+from main.managers import QuerySet
+
+
+SEARCH_CONFIG = 'russian'
+# headline marks, the headline is plain text and is escaped before marks become html, see lessons.views
+HIGHLIGHT_START, HIGHLIGHT_STOP = '\x02', '\x03'
+# headline looks for matches in this many first characters of the texts
+HEADLINE_TEXT_LENGTH = 1000
+
+
+class LessonQuerySet(QuerySet):
+
+    def with_contents_json(self) -> "LessonQuerySet":
+        """
+        Lesson, its school and all its contents in one statement (PostgreSQL only),
+        contents are aggregated to contents_json, see Lesson.use_contents_json().
+        """
+        content_model = self.model._meta.get_field('contents').related_model
+        fields = ('id', 'provider', 'text', 'content_type', 'provider_id', 'priority')
+        contents = content_model.objects.filter(lesson=OuterRef('pk')).order_by().values('lesson').annotate(
+            data=JSONBAgg(JSONObject(**{field: field for field in fields}), ordering=('content_type', 'priority'))
+        ).values('data')
+        return self.select_related('school').annotate(contents_json=Subquery(contents))
+
+    def text_contents(self) -> Subquery:
+        """Texts of the lesson's text contents joined together"""
+        content_model = self.model._meta.get_field('contents').related_model
+        return Subquery(
+            content_model.objects.filter(lesson=OuterRef('pk'), content_type=TEXT).order_by().values('lesson')
+            .annotate(text=StringAgg('text', ' ', ordering='priority')).values('text')
+        )
+
+    def update_search_vector(self) -> int:
+        """
+        Recompute search_vector and title_vector in one UPDATE. Called by lessons.signals,
+        bulk changes which don't send signals must call it themselves.
+        """
+        title = SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        return self.update(title_vector=title, search_vector=(
+            title
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(self.text_contents(), weight='C', config=SEARCH_CONFIG)
+        ))
+
+    def search(self, text: str, limit: int = 30) -> "LessonQuerySet":
+        """
+        Best `limit` lessons matching a websearch style query through the GIN indexes,
+        annotated with rank and headline (description and texts with marked matches).
+        Ranked candidates are the LESSONS_SEARCH_CANDIDATES best title matches (title weighs the most
+        in the rank) and the first LESSONS_SEARCH_CANDIDATES matches of the whole document.
+        """
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        rank = SearchRank(F('search_vector'), query)
+        size = settings.LESSONS_SEARCH_CANDIDATES
+        by_title = self.filter(title_vector=query).order_by(SearchRank(F('title_vector'), query).desc()).values('pk')
+        anywhere = self.filter(search_vector=query).order_by().values('pk')
+        # UNION, OR of two IN subqueries is planned as a scan of the whole table
+        candidates = by_title[:size].union(anywhere[:size])
+        best = self.filter(pk__in=candidates).order_by(rank.desc(), 'id')
+        return self.filter(pk__in=best.values('pk')[:limit]).annotate(
+            rank=rank,
+            # computed for the best rows only, texts are cut as headline time grows with their length
+            headline=SearchHeadline(
+                Concat('description', Value(' '), Left(self.text_contents(), HEADLINE_TEXT_LENGTH)), query,
+                config=SEARCH_CONFIG, start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP,
+                max_words=30, min_words=12, max_fragments=2, fragment_delimiter=' ... ',
+            ),
+        ).defer('search_vector', 'title_vector').order_by('-rank', 'id')
+
+
+LessonManager = BaseManager.from_queryset(LessonQuerySet, class_name='LessonManager')
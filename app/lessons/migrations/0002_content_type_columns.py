@@ -0,0 +1,60 @@
+# Generated by Django 4.1.3 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+# providers as they were when the columns were added, provider: (content_type, provider_id, priority),
+# the migration must not depend on lessons.content_providers, which keeps changing
+PROVIDERS = {
+    '1,1': (1, 1, 1),
+    '1,2': (1, 2, 2),
+    '1,3': (1, 3, 3),
+    '2,1': (2, 1, 1),
+    '2,2': (2, 2, 2),
+    '3,1': (3, 1, 1),
+}
+
+
+def fill_provider_fields(apps, schema_editor):
+    Content = apps.get_model('lessons', 'Content')
+    for provider, (content_type, provider_id, priority) in PROVIDERS.items():
+        Content.objects.filter(provider=provider).update(
+            content_type=content_type, provider_id=provider_id, priority=priority
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='content',
+            options={'ordering': ('content_type', 'priority'), 'verbose_name': 'Контент урока', 'verbose_name_plural': 'Контент уроков'},
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='content_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Видео'), (2, 'Аудио'), (3, 'Текст')], default=0, editable=False, verbose_name='Тип контента'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Приоритет'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='provider_id',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Провайдер'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_provider_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['lesson', 'content_type', 'priority'], name='lesson_content_type_idx'),
+        ),
+    ]
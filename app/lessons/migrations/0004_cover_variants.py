@@ -0,0 +1,23 @@
+# Generated by Django 4.1.3 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0003_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='cover_variants',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Варианты обложки'),
+        ),
+        migrations.AddField(
+            model_name='school',
+            name='cover_variants',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Варианты обложки'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.3 on 2026-10-18 12:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# the same document as LessonQuerySet.update_search_vector()
+BACKFILL = '''
+UPDATE lessons SET search_vector =
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+    || setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(text, ' ' ORDER BY priority) FROM lesson_content
+        WHERE lesson_content.lesson_id = lessons.id AND lesson_content.content_type = 3
+    ), '')), 'C')
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0004_cover_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        # before the index, so it is built once
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='lessons_search_idx'),
+        ),
+    ]
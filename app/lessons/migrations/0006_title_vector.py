@@ -0,0 +1,32 @@
+# Generated by Django 4.1.3 on 2026-10-18 12:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# the same vector as LessonQuerySet.update_search_vector()
+BACKFILL = '''
+UPDATE lessons SET title_vector = setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0005_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='title_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор названия'),
+        ),
+        # before the index, so it is built once
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title_vector'], name='lessons_title_search_idx'),
+        ),
+    ]
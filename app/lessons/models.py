@@ -1,17 +1,22 @@
 from datetime import datetime
 from functools import cached_property
+from operator import attrgetter
 from random import choices
 from string import hexdigits
-from typing import TypeVar
+from typing import Iterable, Optional
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.db import models
-from django.urls import reverse
+from django.urls import resolve, reverse
 
 from main.managers import Manager
-from lessons.content_providers import BaseContentProvider, providers_map, content_types_map, VIDEO, AUDIO, TEXT
-
-
-T = TypeVar('T')
+from lessons.managers import LessonManager
+from lessons.cache import fragment_cache
+from lessons.content_providers import (
+    BaseContentProvider, providers_map, content_types_map, collect_assets, VIDEO, AUDIO, TEXT
+)
 
 
 def upload_to(instance, filename: str):
@@ -32,6 +37,10 @@ class School(models.Model):
     )
     cower_w: int = models.PositiveSmallIntegerField('Ширина обложки', editable=False, default=0)
     cower_h: int = models.PositiveSmallIntegerField('Высота обложки', editable=False, default=0)
+    # see lessons.covers
+    cover_variants: dict = models.JSONField('Варианты обложки', editable=False, default=dict)
+    # also touched by lessons.signals when lessons and contents change
+    updated_at: datetime = models.DateTimeField('Изменено', auto_now=True)
 
     objects = Manager()
 
@@ -47,6 +56,11 @@ class School(models.Model):
     def get_absolute_url(self):
         return reverse('school_lessons', kwargs={'slug': self.slug})
 
+    def clean(self):
+        # pages like /search are routed before school slugs
+        if self.slug and resolve(self.get_absolute_url()).url_name != 'school_lessons':
+            raise ValidationError({'slug': 'Этот синоним занят страницей сайта'})
+
 
 class Lesson(models.Model):
     id: int
@@ -63,8 +77,16 @@ class Lesson(models.Model):
     )
     cower_w: int = models.PositiveSmallIntegerField('Ширина обложки', editable=False, default=0)
     cower_h: int = models.PositiveSmallIntegerField('Высота обложки', editable=False, default=0)
+    # see lessons.covers
+    cover_variants: dict = models.JSONField('Варианты обложки', editable=False, default=dict)
+    # also touched by lessons.signals when lessons and contents change
+    updated_at: datetime = models.DateTimeField('Изменено', auto_now=True)
+    # title, description and text contents, see LessonQuerySet.update_search_vector()
+    search_vector = SearchVectorField('Поисковый вектор', null=True, editable=False)
+    # title part of search_vector, small enough to rank every title match, see LessonQuerySet.search()
+    title_vector = SearchVectorField('Поисковый вектор названия', null=True, editable=False)
 
-    objects = Manager()
+    objects = LessonManager()
 
     class Meta:
         db_table = 'lessons'
@@ -72,6 +94,10 @@ class Lesson(models.Model):
         verbose_name_plural = 'Уроки'
         ordering = ('position',)
         unique_together = (('position', 'school'), )
+        indexes = (
+            GinIndex(fields=('search_vector', ), name='lessons_search_idx'),
+            GinIndex(fields=('title_vector', ), name='lessons_title_search_idx'),
+        )
 
     def __str__(self):
         return f'{self.school}. Урок {self.position}. {self.title}'
@@ -79,56 +105,80 @@ class Lesson(models.Model):
     def get_absolute_url(self):
         return reverse('lesson', kwargs={'slug': self.school.slug, 'position': self.position})
 
-    def get_available_content_types(self):
-        types = set()
-        for content in self.contents.all():
-            types.add(content.type)
-        return [(t, *content_types_map[t]) for t in sorted(types)]
+    @cached_property
+    def content_index(self) -> "LessonContentIndex":
+        return LessonContentIndex(self.contents.all())
 
-    def get_content(self, content_type: int) -> list["Content"]:
-        return [content for content in self.contents.all() if content.type == content_type]
+    def use_contents_json(self):
+        """Build content index from contents_json annotation instead of the contents relation"""
+        self.content_index = LessonContentIndex(ContentRow(**row) for row in self.contents_json or ())
 
-    @staticmethod
-    def sort_by_priority(data: T) -> T:
-        return sorted(data, key=lambda x: x.get_priority())
+    def get_available_content_types(self) -> list[tuple[int, str, str]]:
+        return self.content_index.available_types
 
-    @cached_property
+    def get_content(self, content_type: int) -> list["Content"]:
+        return self.content_index.get(content_type)
+
+    @property
     def videos(self) -> list["Content"]:
-        return self.sort_by_priority(self.get_content(VIDEO))
+        return self.content_index.get(VIDEO)
 
     def main_video(self):
-        return self.videos[0] if self.videos else None
+        return self.content_index.main(VIDEO)
 
-    @cached_property
+    @property
     def audios(self) -> list["Content"]:
-        return self.sort_by_priority(self.get_content(AUDIO))
+        return self.content_index.get(AUDIO)
 
     def main_audio(self):
-        return self.audios[0] if self.audios else None
+        return self.content_index.main(AUDIO)
 
-    @cached_property
+    @property
     def texts(self) -> list["Content"]:
-        return self.sort_by_priority(self.get_content(TEXT))
+        return self.content_index.get(TEXT)
 
     def main_text(self):
-        return self.texts[0] if self.texts else None
+        return self.content_index.main(TEXT)
 
+    def get_content_assets(self) -> dict[str, list[str]]:
+        """Scripts and origins of contents rendered on the lesson page, see lesson_detail.html"""
+        rendered = (self.main_video(), self.main_audio())
+        return collect_assets(providers_map[content.provider] for content in rendered if content)
 
-class Content(models.Model):
-    id: int
-    lesson: Lesson = models.ForeignKey(verbose_name='Урок', to=Lesson, on_delete=models.CASCADE,
-                                       related_name='contents')
-    provider: str = models.CharField('Тип', max_length=10, choices=BaseContentProvider.get_choices())
-    text: str = models.TextField('Текст')
 
-    class Meta:
-        db_table = 'lesson_content'
-        verbose_name = 'Контент урока'
-        verbose_name_plural = 'Контент уроков'
-        ordering = ('provider', )
-        unique_together = (('lesson', 'provider'),)
+class LessonContentIndex:
+    """Lesson contents bucketed by type and sorted by provider priority, built in one pass over the rows"""
+    __slots__ = ('buckets', 'available_types')
 
-    _renderer = None
+    buckets: dict[int, list["Content"]]
+    available_types: list[tuple[int, str, str]]
+
+    def __init__(self, contents: Iterable["Content"]):
+        buckets = {}
+        for content in contents:
+            buckets.setdefault(content.content_type, []).append(content)
+        for bucket in buckets.values():
+            bucket.sort(key=attrgetter('priority'))
+        self.buckets = buckets
+        self.available_types = [(t, *content_types_map[t]) for t in sorted(buckets)]
+
+    def get(self, content_type: int) -> list["Content"]:
+        return self.buckets.get(content_type, [])
+
+    def main(self, content_type: int) -> Optional["Content"]:
+        bucket = self.buckets.get(content_type)
+        return bucket[0] if bucket else None
+
+
+class ContentRenderMixin:
+    __slots__ = ()
+
+    id: int
+    provider: str
+    text: str
+    content_type: int
+    priority: int
+    _renderer: BaseContentProvider | None
 
     def get_renderer(self) -> BaseContentProvider:
         if not self._renderer:
@@ -136,25 +186,71 @@ class Content(models.Model):
         return self._renderer
 
     def render(self):
-        return self.get_renderer().render()
+        kind = 'facade' if providers_map[self.provider].facade_enabled else 'render'
+        return fragment_cache.get_or_render(self, kind, lambda: self.get_renderer().render())
 
     def render_link(self):
-        return self.get_renderer().render_link()
+        return fragment_cache.get_or_render(self, 'link', lambda: self.get_renderer().render_link())
 
     @property
     def type(self) -> int:
-        return int(self.provider.split(',')[0])
-
-    @property
-    def provider_id(self) -> int:
-        return int(self.provider.split(',')[1])
+        return self.content_type
 
     @property
     def group_block_id(self) -> str:
-        return self.get_renderer().group_block_id
+        return content_types_map[self.content_type][1]
 
     def get_priority(self) -> int:
-        return self.get_renderer().priority
+        return self.priority
+
+
+class Content(ContentRenderMixin, models.Model):
+    id: int
+    lesson: Lesson = models.ForeignKey(verbose_name='Урок', to=Lesson, on_delete=models.CASCADE,
+                                       related_name='contents')
+    provider: str = models.CharField('Тип', max_length=10, choices=BaseContentProvider.get_choices())
+    text: str = models.TextField('Текст')
+    # denormalized from provider, maintained in save()
+    content_type: int = models.PositiveSmallIntegerField(
+        'Тип контента', choices=BaseContentProvider.get_content_type_choices(), editable=False
+    )
+    provider_id: int = models.PositiveSmallIntegerField('Провайдер', editable=False)
+    priority: int = models.PositiveSmallIntegerField('Приоритет', editable=False)
+    updated_at: datetime = models.DateTimeField('Изменено', auto_now=True)
+
+    class Meta:
+        db_table = 'lesson_content'
+        verbose_name = 'Контент урока'
+        verbose_name_plural = 'Контент уроков'
+        ordering = ('content_type', 'priority')
+        unique_together = (('lesson', 'provider'),)
+        indexes = (models.Index(fields=('lesson', 'content_type', 'priority'), name='lesson_content_type_idx'), )
+
+    _renderer = None
+
+    def sync_provider_fields(self):
+        provider = providers_map[self.provider]
+        self.content_type, self.provider_id, self.priority = provider.content_type, provider.provider_id, provider.priority
 
     def clean(self):
         self.get_renderer().modify_data()
+
+    def save(self, *args, **kwargs):
+        self.sync_provider_fields()
+        if (update_fields := kwargs.get('update_fields')) is not None and 'provider' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_type', 'provider_id', 'priority'}
+        super().save(*args, **kwargs)
+
+
+class ContentRow(ContentRenderMixin):
+    """Read-only content hydrated from LessonQuerySet.with_contents_json() rows"""
+    __slots__ = ('id', 'provider', 'text', 'content_type', 'provider_id', 'priority', '_renderer')
+
+    def __init__(self, id: int, provider: str, text: str, content_type: int, provider_id: int, priority: int):
+        self.id = id
+        self.provider = provider
+        self.text = text
+        self.content_type = content_type
+        self.provider_id = provider_id
+        self.priority = priority
+        self._renderer = None
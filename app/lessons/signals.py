@@ -0,0 +1,89 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from lessons.cache import fragment_cache, page_cache, Scope
+from lessons.covers import ensure_variants
+from lessons.models import School, Lesson, Content
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_content_fragments(sender, instance: Content, **kwargs):
+    fragment_cache.invalidate(instance)
+
+
+def school_scopes(slug: str) -> set[Scope]:
+    return {('catalog', ), ('school', slug)}
+
+
+def lesson_scopes(school_slug: str, position: int) -> set[Scope]:
+    return {*school_scopes(school_slug), ('lesson', school_slug, position)}
+
+
+@receiver(post_save, sender=School)
+@receiver(post_save, sender=Lesson)
+def build_cover_variants(sender, instance: School | Lesson, **kwargs):
+    ensure_variants(instance)
+
+
+@receiver(post_save, sender=Lesson)
+def update_lesson_search_vector(sender, instance: Lesson, update_fields=None, **kwargs):
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        Lesson.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def update_content_search_vector(sender, instance: Content, **kwargs):
+    # provider may have changed from text to another type, so every content change counts
+    Lesson.objects.filter(pk=instance.lesson_id).update_search_vector()
+
+
+@receiver(pre_save, sender=School)
+def remember_school_scopes(sender, instance: School, **kwargs):
+    old_slug = School.objects.filter(pk=instance.pk).values_list('slug', flat=True).first() if instance.pk else None
+    instance._page_cache_scopes = school_scopes(old_slug) if old_slug else set()
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_scopes(sender, instance: Lesson, **kwargs):
+    old = None
+    if instance.pk:
+        old = Lesson.objects.filter(pk=instance.pk).values_list('school__slug', 'position', 'school_id').first()
+    instance._page_cache_scopes = lesson_scopes(*old[:2]) if old else set()
+    instance._old_school_id = old[2] if old else None
+
+
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def bump_school_pages(sender, instance: School, **kwargs):
+    page_cache.bump(*school_scopes(instance.slug), *getattr(instance, '_page_cache_scopes', ()))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def bump_lesson_pages(sender, instance: Lesson, **kwargs):
+    page_cache.bump(*lesson_scopes(instance.school.slug, instance.position), *getattr(instance, '_page_cache_scopes', ()))
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def bump_content_pages(sender, instance: Content, **kwargs):
+    lesson = instance.lesson
+    page_cache.bump(('lesson', lesson.school.slug, lesson.position))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def touch_lesson_school(sender, instance: Lesson, **kwargs):
+    school_ids = {instance.school_id, getattr(instance, '_old_school_id', None)} - {None}
+    School.objects.filter(pk__in=school_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def touch_content_lesson(sender, instance: Content, **kwargs):
+    now = timezone.now()
+    Lesson.objects.filter(pk=instance.lesson_id).update(updated_at=now)
+    School.objects.filter(lessons=instance.lesson_id).update(updated_at=now)
@@ -0,0 +1,138 @@
+import json
+import os
+from io import BytesIO
+from collections import defaultdict
+from hashlib import blake2b
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import reverse, resolve
+
+from lessons.models import School, Lesson, Content
+from main.release import release_fingerprint
+
+
+def fingerprint(*rows: Any) -> str:
+    """Rows a page is rendered from, with templates and static files, see main.release"""
+    data = json.dumps([release_fingerprint(), *rows], sort_keys=True, default=str)
+    return blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def path_to_file(target: Path, path: str) -> Path:
+    return target / path.strip('/') / 'index.html'
+
+
+def default_host() -> str:
+    return next((host for host in settings.ALLOWED_HOSTS if not host.startswith(('.', '*'))), 'localhost')
+
+
+def page_request(path: str, host: str) -> WSGIRequest:
+    """Anonymous GET request for the page, as the WSGI handler would build it"""
+    request = WSGIRequest({
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '443', 'HTTP_HOST': host,
+        'wsgi.url_scheme': 'https', 'wsgi.input': BytesIO(),
+    })
+    request.user = AnonymousUser()
+    return request
+
+
+def render_page(path: str, host: str) -> bytes:
+    match = resolve(path)
+    view = match.func.view_class.as_view(page_cache_enabled=False, csrf_token_placeholder='')
+    request = page_request(path, host)
+    response = view(request, *match.args, **match.kwargs)
+    return response.render().content
+
+
+def write_page(target: Path, path: str, host: str) -> str:
+    file = path_to_file(target, path)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = file.with_name(f'.{file.name}.{os.getpid()}.tmp')
+    tmp.write_bytes(render_page(path, host))
+    os.replace(tmp, file)
+    return path
+
+
+def _write_page_job(args: tuple[Path, str, str]) -> str:
+    return write_page(*args)
+
+
+class StaticSiteExporter:
+    """
+    Renders catalog pages to <target>/<url>/index.html.
+    Every page has a fingerprint of the rows it is rendered from and of the release, only pages with changed
+    fingerprints are rendered again, fingerprints of the last export are kept in the manifest file.
+    """
+    manifest_name = '.manifest.json'
+
+    def __init__(self, target: Path, workers: int = 1, force: bool = False, host: str | None = None):
+        self.target = target
+        self.workers = workers
+        self.force = force
+        self.host = host or default_host()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.target / self.manifest_name
+
+    def load_manifest(self) -> dict[str, str]:
+        if self.force or not self.manifest_path.exists():
+            return {}
+        return json.loads(self.manifest_path.read_text())
+
+    def save_manifest(self, manifest: dict[str, str]):
+        tmp = self.manifest_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+        os.replace(tmp, self.manifest_path)
+
+    def collect_pages(self) -> dict[str, str]:
+        schools = list(School.objects.values().order_by('position'))
+        lessons = defaultdict(list)
+        for lesson in Lesson.objects.values().order_by('position'):
+            lessons[lesson['school_id']].append(lesson)
+        contents = defaultdict(list)
+        for content in Content.objects.values().order_by('id'):
+            contents[content['lesson_id']].append(content)
+
+        pages = {reverse('school_list'): fingerprint(schools, [len(lessons[s['id']]) for s in schools])}
+        for school in schools:
+            pages[reverse('school_lessons', kwargs={'slug': school['slug']})] = fingerprint(school, lessons[school['id']])
+            for lesson in lessons[school['id']]:
+                path = reverse('lesson', kwargs={'slug': school['slug'], 'position': lesson['position']})
+                pages[path] = fingerprint(school, lesson, contents[lesson['id']])
+        return pages
+
+    def render(self, paths: Iterable[str]) -> list[str]:
+        jobs = [(self.target, path, self.host) for path in paths]
+        if self.workers <= 1 or len(jobs) <= 1:
+            return [_write_page_job(job) for job in jobs]
+        # forked workers must open their own connections
+        connections.close_all()
+        with get_context('fork').Pool(self.workers) as pool:
+            return list(pool.imap_unordered(_write_page_job, jobs, chunksize=8))
+
+    def remove(self, paths: Iterable[str]) -> list[str]:
+        removed = []
+        for path in paths:
+            path_to_file(self.target, path).unlink(missing_ok=True)
+            removed.append(path)
+        return removed
+
+    def export(self) -> tuple[list[str], list[str]]:
+        self.target.mkdir(parents=True, exist_ok=True)
+        old = self.load_manifest()
+        pages = self.collect_pages()
+        changed = [
+            path for path, fp in pages.items()
+            if old.get(path) != fp or not path_to_file(self.target, path).exists()
+        ]
+        rendered = self.render(changed)
+        removed = self.remove(path for path in old if path not in pages)
+        self.save_manifest(pages)
+        return rendered, removed
@@ -0,0 +1,34 @@
+from typing import Any
+
+from django import template
+from django.core.files.storage import default_storage
+from django.db.models import Model
+
+from lessons.covers import FORMATS, ensure_variants
+
+
+register = template.Library()
+
+
+def srcset(variants: list[list]) -> str:
+    return ', '.join(f'{default_storage.url(name)} {width}w' for width, _, name in variants)
+
+
+@register.inclusion_tag('lessons/cover_picture.html')
+def cover_picture(obj: Model, sizes: str, alt: str = '', loading: str = 'lazy') -> dict[str, Any]:
+    """<picture> of obj.cover with a source per variant format, missing variants are built here"""
+    if not obj.cover:
+        return {'cover': None}
+    variants = ensure_variants(obj).get('variants', {})
+    *sources, fallback = variants.items() or [(None, [])]
+    return {
+        'cover': obj.cover,
+        'sources': [{'type': FORMATS[fmt][1], 'srcset': srcset(rendered)} for fmt, rendered in sources],
+        'src': default_storage.url(fallback[1][-1][2]) if fallback[1] else obj.cover.url,
+        'srcset': srcset(fallback[1]),
+        'sizes': sizes,
+        'width': obj.cower_w,
+        'height': obj.cower_h,
+        'alt': alt,
+        'loading': loading,
+    }
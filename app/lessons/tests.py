@@ -1,3 +1,335 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Callable
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from lessons.cache import FragmentCache, fragment_cache
+from lessons.content_providers import BaseContentProvider, VIDEO, AUDIO, TEXT
+from lessons.importer import CatalogImporter, ImportResult, file_records
+from lessons.models import School, Lesson, Content
+
+
+class LessonContentIndexTest(TestCase):
+    providers = ('1,1', '1,2', '1,3', '2,1', '2,2', '3,1')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(position=1, title='Школа', slug='school')
+
+    def create_lesson(self, position: int, providers: tuple[str, ...]) -> Lesson:
+        lesson = Lesson.objects.create(
+            school=self.school, position=position, title=f'Урок {position}', slug=f'lesson-{position}',
+            description='Описание'
+        )
+        for provider in reversed(providers):
+            Content.objects.create(lesson=lesson, provider=provider, text='1,2')
+        return Lesson.objects.prefetch_related('contents').get(pk=lesson.pk)
+
+    def count_instantiations(self, lesson: Lesson) -> int:
+        fragment_cache.clear()
+        init = BaseContentProvider.__init__
+        with mock.patch.object(BaseContentProvider, '__init__', autospec=True, side_effect=init) as patched:
+            render_to_string('lessons/lesson_detail.html', {'lesson': lesson})
+            lesson.get_available_content_types()
+            lesson.videos, lesson.audios, lesson.texts
+        return patched.call_count
+
+    def test_index_buckets_and_order(self):
+        lesson = self.create_lesson(1, self.providers)
+        with self.assertNumQueries(0):
+            self.assertEqual([c.provider for c in lesson.videos], ['1,1', '1,2', '1,3'])
+            self.assertEqual([c.provider for c in lesson.audios], ['2,1', '2,2'])
+            self.assertEqual([c.provider for c in lesson.texts], ['3,1'])
+            self.assertEqual(lesson.main_video().provider, '1,1')
+            self.assertEqual([t for t, *_ in lesson.get_available_content_types()], [VIDEO, AUDIO, TEXT])
+
+    def test_provider_instantiations_per_content(self):
+        small = self.create_lesson(1, ('1,2', '2,2'))
+        large = self.create_lesson(2, self.providers)
+        self.assertLessEqual(self.count_instantiations(small), len(small.contents.all()))
+        self.assertLessEqual(self.count_instantiations(large), len(large.contents.all()))
+
+
+class FragmentCacheTest(SimpleTestCase):
+
+    @staticmethod
+    def content(id: int, text: str = 'Текст') -> Content:
+        return Content(id=id, provider='3,1', text=text)
+
+    def test_eviction_past_max_size(self):
+        cache = FragmentCache(max_size=2)
+        for id in range(1, 6):
+            self.assertEqual(cache.get_or_render(self.content(id), 'render', lambda: f'<p>{id}</p>'), f'<p>{id}</p>')
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 5, 'size': 2, 'max_size': 2})
+        self.assertEqual(set(cache._keys_by_content), {4, 5})
+        self.assertEqual(cache.get_or_render(self.content(5), 'render', lambda: 'new'), '<p>5</p>')
+        self.assertEqual(cache.get_or_render(self.content(1), 'render', lambda: 'new'), 'new')
+
+    def test_recently_used_fragments_stay(self):
+        cache = FragmentCache(max_size=2)
+        cache.get_or_render(self.content(1), 'render', lambda: 'one')
+        cache.get_or_render(self.content(2), 'render', lambda: 'two')
+        cache.get_or_render(self.content(1), 'render', lambda: 'new')
+        cache.get_or_render(self.content(3), 'render', lambda: 'three')
+        self.assertEqual(cache.get_or_render(self.content(1), 'render', lambda: 'new'), 'one')
+        self.assertEqual(cache.get_or_render(self.content(2), 'render', lambda: 'new'), 'new')
+
+    def test_hits_and_misses(self):
+        cache = FragmentCache(max_size=10)
+        render = mock.Mock(return_value='<p>1</p>')
+        for _ in range(3):
+            cache.get_or_render(self.content(1), 'render', render)
+        cache.get_or_render(self.content(1), 'link', render)
+        cache.get_or_render(self.content(1, 'Другой текст'), 'render', render)
+        self.assertEqual(render.call_count, 3)
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 3, 'size': 3, 'max_size': 10})
+        cache.clear()
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 0, 'size': 0, 'max_size': 10})
+
+    def test_unsaved_content_and_disabled_cache_are_not_stored(self):
+        cache = FragmentCache(max_size=10)
+        cache.get_or_render(Content(provider='3,1', text='Текст'), 'render', lambda: 'x')
+        self.assertEqual(cache.stats()['size'], 0)
+        cache = FragmentCache(max_size=0)
+        cache.get_or_render(self.content(1), 'render', lambda: 'x')
+        self.assertEqual(cache.stats()['size'], 0)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragments-test'},
+    })
+    def test_shared_layer(self):
+        worker, other_worker = FragmentCache(max_size=10, backend='fragments'), FragmentCache(max_size=10, backend='fragments')
+        content = self.content(1)
+        worker.get_or_render(content, 'render', lambda: 'shared')
+        self.assertEqual(other_worker.get_or_render(content, 'render', lambda: 'new'), 'shared')
+        self.assertEqual(other_worker.stats()['hits'], 1)
+        worker.invalidate(content)
+        self.assertEqual(worker.stats()['size'], 0)
+        third_worker = FragmentCache(max_size=10, backend='fragments')
+        self.assertEqual(third_worker.get_or_render(content, 'render', lambda: 'new'), 'new')
+
+
+class FragmentCacheInvalidationTest(TestCase):
+
+    def setUp(self):
+        fragment_cache.clear()
+        school = School.objects.create(position=1, title='Школа', slug='school')
+        lesson = Lesson.objects.create(school=school, position=1, title='Урок', slug='lesson', description='Описание')
+        self.content = Content.objects.create(lesson=lesson, provider='3,1', text='Текст')
+        self.content.render()
+        self.content.render_link()
+
+    def test_save_invalidates(self):
+        self.assertEqual(fragment_cache.stats()['size'], 2)
+        self.content.text = 'Новый текст'
+        self.content.save()
+        self.assertEqual(fragment_cache.stats()['size'], 0)
+        self.content.render()
+        self.assertEqual(fragment_cache.stats()['misses'], 3)
+
+    def test_delete_invalidates(self):
+        self.content.delete()
+        self.assertEqual(fragment_cache.stats()['size'], 0)
+
+
+@override_settings(LESSONS_SEARCH_CANDIDATES=3)
+class LessonSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        school = School.objects.create(position=1, title='Школа', slug='school')
+        for position in range(1, 7):
+            Lesson.objects.create(
+                school=school, position=position, title=f'Урок {position}', slug=f'lesson-{position}',
+                description=f'Упражнения для спины, день {position}',
+            )
+        # created last, so it is beyond the cap in table order
+        cls.best = Lesson.objects.create(
+            school=school, position=7, title='Здоровая спина', slug='lesson-7', description='Упражнения для спины',
+        )
+
+    def test_title_match_beyond_candidates_cap(self):
+        results = list(Lesson.objects.search('спина', limit=2))
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], self.best)
+        self.assertIn('\x02спины\x03', results[0].headline)
+
+    def test_candidates_cap_and_order(self):
+        # no title matches, only the first 3 matches are ranked
+        results = list(Lesson.objects.search('упражнения'))
+        self.assertEqual(len(results), 3)
+        self.assertEqual([lesson.rank for lesson in results], sorted((lesson.rank for lesson in results), reverse=True))
+        self.assertEqual(list(Lesson.objects.search('несуществующее')), [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'etag'}})
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(position=1, title='Школа', slug='school')
+        cls.lesson = Lesson.objects.create(
+            school=cls.school, position=1, title='Урок', slug='lesson', description='Описание'
+        )
+        cls.content = Content.objects.create(lesson=cls.lesson, provider='3,1', text='Текст')
+
+    def assert_revalidation(self, url: str, change: Callable[[], None]):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def edit_content(self):
+        self.content.text = 'Новый текст'
+        self.content.save()
+
+    def new_release(self):
+        patcher = mock.patch('lessons.views.release_fingerprint', return_value='next-release')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lesson(self):
+        url = self.lesson.get_absolute_url()
+        self.assert_revalidation(url, self.edit_content)
+        self.assert_revalidation(url, self.new_release)
+
+    def test_school_list(self):
+        self.assert_revalidation('/', lambda: School.objects.create(position=2, title='Вторая', slug='second'))
+        self.assert_revalidation('/', self.edit_content)
+        self.assert_revalidation('/', self.new_release)
+
+    def test_missing_page_has_no_etag(self):
+        response = self.client.get('/school/99')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+IMPORT_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'importer'}}
+
+
+def catalog(schools: int = 1, lessons: int = 2) -> list[dict[str, Any]]:
+    """Records of an export, contents are listed before their lessons"""
+    records = []
+    for s in range(1, schools + 1):
+        for n in range(1, lessons + 1):
+            slug = f'lesson-{s}-{n}'
+            records += [
+                {'type': 'content', 'lesson': slug, 'provider': '3,1', 'text': f'Текст {slug}'},
+                {'type': 'content', 'lesson': slug, 'provider': '1,2',
+                 'text': f'<iframe src="https://www.youtube.com/embed/video-{s}-{n}"></iframe>'},
+                {'type': 'lesson', 'school': f'school-{s}', 'slug': slug, 'position': n, 'title': f'Урок {n}',
+                 'description': 'Описание'},
+            ]
+        records.append({'type': 'school', 'slug': f'school-{s}', 'position': s, 'title': f'Школа {s}'})
+    return records
+
+
+@override_settings(CACHES=IMPORT_CACHES)
+class CatalogImporterTest(TestCase):
+
+    def run_import(self, records: list[dict[str, Any] | str], **options) -> ImportResult:
+        file = io.BytesIO(''.join(
+            f'{record if isinstance(record, str) else json.dumps(record)}\n' for record in records
+        ).encode())
+        return CatalogImporter(**options).run(lambda: file_records(file, 'catalog.ndjson'))
+
+    def test_import(self):
+        result = self.run_import(catalog(schools=2, lessons=3), batch_size=2)
+        self.assertEqual(result, ImportResult(2, 6, 12, [], True))
+        lesson = Lesson.objects.get(slug='lesson-2-3')
+        self.assertEqual((lesson.school.slug, lesson.position), ('school-2', 3))
+        self.assertEqual(lesson.contents.get(provider='1,2').text, 'video-2-3')
+        self.assertTrue(Lesson.objects.search('Урок').exists())
+
+    def test_duplicates_are_reported(self):
+        self.run_import(catalog())
+        records = [
+            {'type': 'school', 'slug': 'school-1', 'position': 9, 'title': 'Другая'},
+            {'type': 'school', 'slug': 'school-2', 'position': 2, 'title': 'Школа 2'},
+            {'type': 'school', 'slug': 'school-3', 'position': 2, 'title': 'Школа 3'},
+            {'type': 'lesson', 'school': 'school-1', 'slug': 'lesson-1-1', 'position': 5, 'title': 'Урок',
+             'description': 'Описание'},
+            {'type': 'lesson', 'school': 'school-1', 'slug': 'lesson-1-5', 'position': 2, 'title': 'Урок',
+             'description': 'Описание'},
+            {'type': 'content', 'lesson': 'lesson-1-1', 'provider': '3,1', 'text': 'Ещё текст'},
+            {'type': 'content', 'lesson': 'lesson-1-2', 'provider': '1,1', 'text': 'oid=1&id=2'},
+            {'type': 'content', 'lesson': 'lesson-1-2', 'provider': '1,1', 'text': 'oid=1&id=3'},
+        ]
+        result = self.run_import(records, batch_size=1)
+        self.assertEqual([error[:3] for error in result.errors], [
+            (1, 'school', 'school-1'), (3, 'school', 'school-3'), (4, 'lesson', 'lesson-1-1'),
+            (5, 'lesson', 'lesson-1-5'), (6, 'content', 'lesson-1-1'), (8, 'content', 'lesson-1-2'),
+        ])
+        self.assertIn('slug school-1', result.errors[0].message)
+        self.assertIn('position 2', result.errors[1].message)
+        self.assertFalse(result.saved)
+        self.assertFalse(School.objects.filter(slug='school-2').exists())
+        self.assertEqual(Content.objects.count(), 4)
+
+    def test_skip_invalid(self):
+        records = catalog() + [
+            '{not json', {'type': 'teacher'},
+            {'type': 'lesson', 'school': 'missing', 'slug': 'orphan', 'position': 1, 'title': 'Урок',
+             'description': 'Описание'},
+            {'type': 'content', 'lesson': 'lesson-1-1', 'provider': '9,9', 'text': 'x'},
+            {'type': 'content', 'lesson': 'lesson-1-2', 'provider': '1,3', 'text': '<iframe width="1"></iframe>'},
+        ]
+        result = self.run_import(records, skip_invalid=True)
+        self.assertEqual([error.line for error in result.errors], [8, 9, 10, 11, 12])
+        self.assertIn('Нет школы missing', result.errors[2].message)
+        self.assertIn('Не удалось разобрать код вставки', result.errors[4].message)
+        self.assertEqual(result, ImportResult(1, 2, 4, result.errors, True))
+        self.assertEqual(Content.objects.count(), 4)
+
+    def test_dry_run(self):
+        result = self.run_import(catalog(), dry_run=True)
+        self.assertEqual(result, ImportResult(1, 2, 4, [], False))
+        self.assertFalse(School.objects.exists())
+
+    def test_existing_lessons_are_referenced(self):
+        self.run_import(catalog()[-1:])
+        self.run_import([record for record in catalog() if record['type'] != 'school'])
+        self.assertEqual(Lesson.objects.filter(school__slug='school-1').count(), 2)
+
+
+@override_settings(CACHES=IMPORT_CACHES)
+class ImportLessonsCommandTest(TransactionTestCase):
+    """Workers are forked outside of the transaction, so they can't run in TestCase"""
+
+    def call(self, records: list[dict[str, Any]], *args: str) -> tuple[str, str]:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'catalog.ndjson'
+        path.write_text(''.join(f'{json.dumps(record)}\n' for record in records))
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_lessons', path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_workers(self):
+        stdout, stderr = self.call(catalog(schools=2, lessons=10), '--workers', '2', '--batch-size', '8')
+        self.assertIn('Imported 2 schools, 20 lessons, 40 contents, 0 errors', stdout)
+        self.assertEqual(stderr, '')
+        self.assertEqual(
+            sorted(Content.objects.filter(provider='1,2').values_list('text', flat=True)),
+            sorted(f'video-{s}-{n}' for s in (1, 2) for n in range(1, 11)),
+        )
+
+    def test_errors_are_reported(self):
+        records = catalog()
+        records.insert(0, {'type': 'content', 'lesson': 'lesson-1-1', 'provider': '3,1', 'text': 'Снова'})
+        stdout, stderr = self.call(records, '--workers', '2')
+        self.assertIn('Nothing saved: 1 schools, 2 lessons, 4 contents, 1 errors', stdout)
+        self.assertIn('catalog.ndjson:2 content lesson-1-1: В уроке уже есть', stderr)
+        self.assertFalse(School.objects.exists())
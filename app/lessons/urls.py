@@ -5,6 +5,8 @@ from .views import *
 
 urlpatterns = [
     path('', SchoolListView.as_view(), name='school_list'),
+    # before school slugs
+    path('search', SearchView.as_view(), name='search'),
     path('<slug:slug>', SchoolDetailView.as_view(), name='school_lessons'),
     path('<slug:slug>/<int:position>', LessonDetailView.as_view(), name='lesson'),
 ]
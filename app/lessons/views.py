@@ -1,11 +1,84 @@
-from django.db.models import Count
+from datetime import datetime
+from typing import Callable
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.decorators import method_decorator
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import SafeString, mark_safe
+from django.views.decorators.http import condition
 from django.views.generic import DetailView, ListView
 
+from main.release import release_fingerprint
 from main.views import BaseContextMixin
+from lessons.cache import page_cache, Scope, CSRF_PLACEHOLDER
+from lessons.managers import HIGHLIGHT_START, HIGHLIGHT_STOP
 from lessons.models import School, Lesson
 
 
-class SchoolListView(BaseContextMixin, ListView):
+State = tuple[datetime, str] | None
+
+
+def catalog_condition(get_state: Callable[..., State]):
+    """
+    Conditional GET for catalog pages, get_state returns (last_modified, etag) or None if page not found.
+    State is computed from updated_at columns, page is not rendered for 304.
+    Only the ETag is sent, it is salted with release_fingerprint(), so a deploy which changes templates
+    or static files isn't answered with 304 for pages rendered before it.
+    """
+    def etag(request, *args, **kwargs) -> str | None:
+        if state := get_state(request, *args, **kwargs):
+            return f'{state[1]}-{release_fingerprint()}'
+
+    return method_decorator(condition(etag_func=etag), name='dispatch')
+
+
+def school_list_state(request) -> State:
+    state = School.objects.aggregate(updated_at=Max('updated_at'), count=Count('id'))
+    if state['updated_at']:
+        return state['updated_at'], f'{state["count"]}-{state["updated_at"].timestamp()}'
+
+
+def school_state(request, slug: str) -> State:
+    updated_at = School.objects.filter(slug=slug).values_list('updated_at', flat=True).first()
+    if updated_at:
+        return updated_at, str(updated_at.timestamp())
+
+
+def lesson_state(request, slug: str, position: int) -> State:
+    row = Lesson.objects.filter(school__slug=slug, position=position).values_list('updated_at', 'school__updated_at')
+    if row := row.first():
+        updated_at = max(row)
+        return updated_at, str(updated_at.timestamp())
+
+
+class PageCacheMixin:
+    page_cache_enabled = True
+
+    def get(self, request, *args, **kwargs):
+        if not (self.page_cache_enabled and page_cache.is_cacheable(request)):
+            return super().get(request, *args, **kwargs)
+        key = page_cache.make_key(request, self.get_page_cache_scopes())
+        content = page_cache.get(key)
+        if content is None:
+            self.csrf_token_placeholder = CSRF_PLACEHOLDER
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = response.render().content
+            if self.page_is_cacheable():
+                page_cache.set(key, content)
+        return page_cache.make_response(request, content)
+
+    def get_page_cache_scopes(self) -> tuple[Scope, ...]:
+        return ('catalog', ),
+
+    def page_is_cacheable(self) -> bool:
+        return True
+
+
+@catalog_condition(school_list_state)
+class SchoolListView(PageCacheMixin, BaseContextMixin, ListView):
 
     title = 'Школа здоровья'
     context_object_name = 'schools'
@@ -15,7 +88,8 @@ class SchoolListView(BaseContextMixin, ListView):
         return {'Школы здоровья': '#'}
 
 
-class SchoolDetailView(BaseContextMixin, DetailView):
+@catalog_condition(school_state)
+class SchoolDetailView(PageCacheMixin, BaseContextMixin, DetailView):
 
     context_object_name = 'school'
     school_exist: bool
@@ -27,6 +101,12 @@ class SchoolDetailView(BaseContextMixin, DetailView):
     def get_object(self, queryset=None):
         return self.queryset.get_or_none(slug=self.kwargs['slug'])
 
+    def get_page_cache_scopes(self) -> tuple[Scope, ...]:
+        return ('school', self.kwargs['slug']),
+
+    def page_is_cacheable(self) -> bool:
+        return self.object is not None
+
     def get_navbar_history(self, **kwargs) -> dict[str, str]:
         if self.object:
             return {'Школы здоровья': '/', self.object.title: '#'}  # self.object.get_absolute_url()}
@@ -36,7 +116,8 @@ class SchoolDetailView(BaseContextMixin, DetailView):
         return self.object.title if self.object else 'Ничего не нашёл:('
 
 
-class LessonDetailView(BaseContextMixin, DetailView):
+@catalog_condition(lesson_state)
+class LessonDetailView(PageCacheMixin, BaseContextMixin, DetailView):
 
     context_object_name = 'lesson'
     school_exist: bool
@@ -49,7 +130,25 @@ class LessonDetailView(BaseContextMixin, DetailView):
         return str(self.object) if self.object else 'Ничего не нашёл:('
 
     def get_object(self, queryset=None):
-        return self.queryset.get_or_none(school__slug=self.kwargs['slug'], position=self.kwargs['position'])
+        filters = {'school__slug': self.kwargs['slug'], 'position': self.kwargs['position']}
+        if settings.LESSONS_FETCH_MODE != 'json':
+            return self.queryset.get_or_none(**filters)
+        lesson = Lesson.objects.with_contents_json().get_or_none(**filters)
+        if lesson:
+            lesson.use_contents_json()
+        return lesson
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.object:
+            context['content_assets'] = self.object.get_content_assets()
+        return context
+
+    def get_page_cache_scopes(self) -> tuple[Scope, ...]:
+        return ('school', self.kwargs['slug']), ('lesson', self.kwargs['slug'], self.kwargs['position'])
+
+    def page_is_cacheable(self) -> bool:
+        return self.object is not None
 
     def get_navbar_history(self, **kwargs) -> dict[str, str]:
         if self.object:
@@ -59,3 +158,37 @@ class LessonDetailView(BaseContextMixin, DetailView):
                 f'Урок {self.object.position}': '#',  # self.object.get_absolute_url()
             }
         return {'Школы здоровья': '/'}
+
+
+def highlight(headline: str) -> SafeString:
+    """Search headline as html, matches in <mark>"""
+    html = escape(strip_tags(headline))
+    return mark_safe(html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>'))
+
+
+class SearchView(BaseContextMixin, ListView):
+
+    title = 'Поиск'
+    context_object_name = 'lessons'
+    template_name = 'lessons/search.html'
+    results_limit = 30
+
+    def get_search_query(self) -> str:
+        return self.request.GET.get('q', '').strip()[:200]
+
+    def get_queryset(self):
+        if not (query := self.get_search_query()):
+            return Lesson.objects.none()
+        lessons = list(Lesson.objects.search(query, self.results_limit).select_related('school'))
+        for lesson in lessons:
+            lesson.snippet = highlight(lesson.headline)
+        return lessons
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.get_search_query()
+        context['results_limit'] = self.results_limit
+        return context
+
+    def get_navbar_history(self, **kwargs) -> dict[str, str]:
+        return {'Школы здоровья': '/', 'Поиск': '#'}
@@ -1,5 +1,15 @@
+import json
+from functools import cache, cached_property
+
 from django.contrib import admin
 from django.contrib.admin import AdminSite
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import BadRequest, FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import BooleanField, Field
+from django.db.models.expressions import RawSQL
 from django.template.loader import select_template
 from django.contrib.auth.models import Group
 
@@ -17,15 +27,20 @@ default_site.index_title = "Администрирование"
 default_site.unregister(Group)
 
 
+@cache
+def get_admin_template(app_label: str, model_name: str, attr: str) -> str:
+    return select_template((
+        f'{app_label}/admin/{model_name}/{attr}.html',
+        f'{app_label}/admin/{attr}.html',
+        f'main/admin/{attr}.html'
+    )).template.name
+
+
 class ModelAdminMixin:
     def __init__(self, model, admin_site):
         super().__init__(model, admin_site)
         for attr in ('change_form', 'change_list'):
-            setattr(self, f'{attr}_template', select_template((
-                f'{self.opts.app_label}/admin/{self.opts.model_name}/{attr}.html',
-                f'{self.opts.app_label}/admin/{attr}.html',
-                f'main/admin/{attr}.html'
-            )).template.name)
+            setattr(self, f'{attr}_template', get_admin_template(self.opts.app_label, self.opts.model_name, attr))
 
     @staticmethod
     def get_custom_object_tools_list(context: dict) -> list[dict]:
@@ -39,3 +54,125 @@ class ModelAdminMixin:
 
 class ModelAdmin(ModelAdminMixin, admin.ModelAdmin):
     pass
+
+
+class EstimatedCountPaginator(Paginator):
+    """Reads row count of large unfiltered tables from planner statistics instead of COUNT(*) (PostgreSQL)"""
+    estimate_threshold = 100_000
+    estimated = False
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                self.estimated = True
+                return row[0]
+        return super().count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Change list paginated by a cursor over model_admin.keyset_fields instead of OFFSET.
+    Ordering is fixed to keyset_fields (ascending, the last one must be unique), so every page is one index range scan.
+    Next page starts after the last row (?after=), previous page ends before the first one (?before=).
+    """
+    cursor_var = 'after'
+    cursor_before_var = 'before'
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(self.cursor_var)
+        self.cursor_before = request.GET.get(self.cursor_before_var)
+        super().__init__(request, *args, **kwargs)
+
+    @property
+    def keyset_fields(self) -> tuple[str, ...]:
+        return self.model_admin.keyset_fields
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(self.cursor_var, None)
+        lookup_params.pop(self.cursor_before_var, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        return super().get_query_string(new_params, [*(remove or ()), self.cursor_var, self.cursor_before_var])
+
+    def get_ordering(self, request, queryset):
+        return list(self.keyset_fields)
+
+    @cached_property
+    def keyset_model_fields(self) -> list[Field]:
+        opts = self.model._meta
+        return [opts.pk if name == 'pk' else opts.get_field(name) for name in self.keyset_fields]
+
+    def make_cursor(self, obj) -> str:
+        return json.dumps([getattr(obj, field.attname) for field in self.keyset_model_fields], cls=DjangoJSONEncoder)
+
+    def cursor_filter(self, cursor: str, operator: str = '>') -> RawSQL:
+        opts = self.model._meta
+        qn = connections[self.queryset.db].ops.quote_name
+        try:
+            values = json.loads(cursor)
+            fields = self.keyset_model_fields
+            values = [field.to_python(value) for field, value in zip(fields, values, strict=True)]
+        except (ValueError, TypeError, FieldDoesNotExist, ValidationError):
+            # IncorrectLookupParameters would redirect to the ?e=1 page with status 200
+            raise BadRequest(f'Bad cursor: {cursor}')
+        columns = ', '.join(f'{qn(opts.db_table)}.{qn(field.column)}' for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        return RawSQL(f'({columns}) {operator} ({placeholders})', values, output_field=BooleanField())
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        if self.cursor_before:
+            # read backwards from the cursor, the same index scanned in reverse
+            queryset = self.queryset.filter(self.cursor_filter(self.cursor_before, '<'))
+            rows = list(queryset.order_by(*(f'-{name}' for name in self.keyset_fields))[:self.list_per_page + 1])
+            self.result_list = rows[:self.list_per_page][::-1]
+            has_previous, has_next = len(rows) > self.list_per_page, True
+        else:
+            queryset = self.queryset
+            if self.cursor:
+                queryset = queryset.filter(self.cursor_filter(self.cursor))
+            rows = list(queryset[:self.list_per_page + 1])
+            self.result_list = rows[:self.list_per_page]
+            has_previous, has_next = bool(self.cursor), len(rows) > self.list_per_page
+
+        self.next_cursor = self.make_cursor(self.result_list[-1]) if has_next and self.result_list else None
+        self.previous_cursor = self.make_cursor(self.result_list[0]) if has_previous and self.result_list else None
+        self.result_count = paginator.count
+        self.result_count_estimated = getattr(paginator, 'estimated', False)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or self.cursor_before or self.next_cursor)
+        self.paginator = paginator
+
+    @property
+    def first_page_url(self) -> str:
+        return self.get_query_string()
+
+    @property
+    def next_page_url(self) -> str | None:
+        return self.next_cursor and self.get_query_string({self.cursor_var: self.next_cursor})
+
+    @property
+    def previous_page_url(self) -> str | None:
+        return self.previous_cursor and self.get_query_string({self.cursor_before_var: self.previous_cursor})
+
+
+class KeysetPaginationMixin:
+    keyset_fields: tuple[str, ...] = ('pk', )
+    sortable_by = ()
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
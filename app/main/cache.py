@@ -0,0 +1,215 @@
+import os
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from time import time
+from typing import Any
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache shared by every worker process on the host, stored in a SQLite database in WAL mode.
+
+    LOCATION is the database path. Entries expire by timeout, the least recently used ones are evicted
+    when there are more than MAX_ENTRIES. Access time is written at most once per ACCESS_RESOLUTION seconds
+    per entry, so hot reads don't turn into writes. Integers are stored unpickled, so incr() is one UPDATE.
+
+    OPTIONS: MAX_ENTRIES, CULL_FREQUENCY (see django docs), ACCESS_RESOLUTION, CULL_EVERY (sets between
+    eviction checks in a process), BUSY_TIMEOUT (seconds to wait for a writer).
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    schema = (
+        'CREATE TABLE IF NOT EXISTS cache ('
+        'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL'
+        ') WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+        'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires) WHERE expires IS NOT NULL',
+    )
+
+    def __init__(self, location: str, params: dict[str, Any]):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = Path(location)
+        self.access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._sets = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self.connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in self.schema:
+            connection.execute(statement)
+        return connection
+
+    def encode(self, value: Any) -> int | bytes:
+        # sqlite integers are 64-bit, bigger ones are pickled like any other value
+        if type(value) is int and INT64_MIN <= value <= INT64_MAX:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def decode(value: int | bytes) -> Any:
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time()
+        # fetchall steps statements to the end, an unfinished one would keep a read snapshot open
+        rows = self.connection.execute(
+            'SELECT value, accessed FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, now)
+        ).fetchall()
+        if not rows:
+            return default
+        (value, accessed), = rows
+        if now - accessed > self.access_resolution:
+            self.connection.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return self.decode(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not keys:
+            return {}
+        now = time()
+        rows = self.connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({", ".join("?" * len(keys))}) '
+            f'AND (expires IS NULL OR expires > ?)', (*keys, now)
+        ).fetchall()
+        if rows:
+            self.connection.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({", ".join("?" * len(rows))}) AND accessed < ?',
+                (now, *(key for key, _ in rows), now - self.access_resolution)
+            )
+        return {keys[key]: self.decode(value) for key, value in rows}
+
+    def _set(self, statement: str, key: str, value: Any, timeout) -> bool:
+        cursor = self.connection.execute(
+            statement, (key, self.encode(value), self.get_backend_timeout(timeout), time())
+        )
+        self._sets += 1
+        if self._sets >= self.cull_every:
+            self._sets = 0
+            self.cull()
+        return cursor.rowcount > 0
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._set('INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)', key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # replaces only an expired entry
+        return self._set(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= excluded.accessed',
+            key, value, timeout,
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires, now = self.get_backend_timeout(timeout), time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), self.encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)', rows)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time()
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        connection = self.connection
+        # UPDATE ... RETURNING needs sqlite 3.35, the image has 3.34 (debian bullseye)
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            new_value = self._incr(connection, key, cache_key, delta, version)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return new_value
+
+    def _incr(self, connection: sqlite3.Connection, key, cache_key: str, delta: int, version) -> Any:
+        if INT64_MIN <= delta <= INT64_MAX:
+            # sqlite turns an overflowing sum into a float, such sums are left to the pickled path
+            cursor = connection.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? AND typeof(value) = 'integer' "
+                "AND value + ? BETWEEN ? AND ? AND (expires IS NULL OR expires > ?)",
+                (delta, cache_key, delta, INT64_MIN, INT64_MAX, time()),
+            )
+            if cursor.rowcount:
+                (value, ), = connection.execute('SELECT value FROM cache WHERE key = ?', (cache_key, )).fetchall()
+                return value
+        # pickled values, the write lock is held, so this is atomic too
+        value = self.get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            raise ValueError(f"Key '{cache_key}' not found")
+        new_value = value + delta
+        self.set(key, new_value, version=version)
+        return new_value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self.connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time())
+        ).fetchall())
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.connection.execute('DELETE FROM cache WHERE key = ?', (key, )).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self.connection.execute(f'DELETE FROM cache WHERE key IN ({", ".join("?" * len(keys))})', keys)
+
+    def cull(self):
+        connection = self.connection
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (time(), ))
+        (count, ), = connection.execute('SELECT count(*) FROM cache').fetchall()
+        if count > self._max_entries:
+            if not self._cull_frequency:
+                return self.clear()
+            excess = count - self._max_entries + self._max_entries // self._cull_frequency
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess, )
+            )
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # connection lives as long as the worker, django calls close() after every request
+        pass
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+
+ENGINES = ('django.contrib.sessions.backends.db', 'main.sessions')
+PAGES = ('admin:index', 'admin:lessons_school_changelist', 'admin:lessons_lesson_changelist', 'admin:tickets_ticket_changelist')
+
+
+class Command(BaseCommand):
+    help = 'Count database queries per admin page, total and session queries, for db and main.sessions engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--number', type=int, default=5, help='requests per page')
+
+    def handle(self, *args, number: int, **options):
+        user = get_user_model().objects.filter(is_superuser=True, is_active=True).first()
+        if user is None:
+            raise CommandError('Superuser is required')
+        urls = [reverse(page) for page in PAGES]
+        self.stdout.write(f'{"engine":<40}{"page":<32}{"queries":>9}{"session":>9}')
+        for engine in ENGINES:
+            with override_settings(SESSION_ENGINE=engine), transaction.atomic():
+                client = Client()
+                client.force_login(user)
+                for url in urls:
+                    client.get(url)
+                    with CaptureQueriesContext(connection) as queries:
+                        for _ in range(number):
+                            client.get(url)
+                    session = sum('django_session' in query['sql'] for query in queries)
+                    self.stdout.write(f'{engine:<40}{url:<32}{len(queries) / number:>9.1f}{session / number:>9.1f}')
+                transaction.set_rollback(True)
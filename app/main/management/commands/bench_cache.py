@@ -0,0 +1,86 @@
+import os
+import tempfile
+from multiprocessing import get_context
+from time import perf_counter
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+
+def backends(directory: str) -> dict[str, dict]:
+    return {
+        'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 100_000}},
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(directory, 'file'), 'OPTIONS': {'MAX_ENTRIES': 100_000},
+        },
+        'sqlite': {
+            'BACKEND': 'main.cache.SQLiteCache',
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'), 'OPTIONS': {'MAX_ENTRIES': 100_000},
+        },
+    }
+
+
+def set_job(alias: str, worker_id: int, keys: int, operations: int, size: int, barrier, results):
+    cache = caches[alias]
+    value = 'x' * size
+    start = perf_counter()
+    for i in range(operations):
+        cache.set(f'key-{worker_id}-{i % keys}', value)
+    results.put(('set', perf_counter() - start, 0))
+    barrier.wait()
+
+
+def get_job(alias: str, worker_id: int, keys: int, operations: int, size: int, barrier, results):
+    cache = caches[alias]
+    # starts when every writer has finished
+    barrier.wait()
+    hits = 0
+    start = perf_counter()
+    for i in range(operations):
+        hits += cache.get(f'key-{worker_id}-{i % keys}') is not None
+    results.put(('get', perf_counter() - start, hits))
+
+
+class Command(BaseCommand):
+    help = 'Compare get/set throughput of LocMemCache, FileBasedCache and SQLiteCache under concurrent processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-p', '--processes', type=int, default=4, help='writer processes, as many readers')
+        parser.add_argument('-n', '--number', type=int, default=5000, help='sets or gets per process')
+        parser.add_argument('--keys', type=int, default=1000, help='distinct keys per process')
+        parser.add_argument('--size', type=int, default=1024, help='value size, bytes')
+
+    def handle(self, *args, processes: int, number: int, keys: int, size: int, **options):
+        self.stdout.write(f'{"backend":<10}{"sets/s":>12}{"gets/s":>12}{"shared hits":>13}')
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES=backends(directory)):
+            for alias in ('locmem', 'file', 'sqlite'):
+                times, hits = self.run(alias, processes, number, keys, size)
+                set_rate = processes * number / max(times['set'])
+                get_rate = processes * number / max(times['get'])
+                self.stdout.write(f'{alias:<10}{set_rate:>12.0f}{get_rate:>12.0f}{hits / (processes * number):>12.0%}')
+
+    @staticmethod
+    def run(alias: str, processes: int, number: int, keys: int, size: int) -> tuple[dict[str, list[float]], int]:
+        """
+        A process per writer and per reader, every reader reads keys of one writer, so hits show
+        whether values are visible to other processes.
+        """
+        context = get_context('fork')
+        barrier = context.Barrier(processes * 2)
+        results = context.SimpleQueue()
+        workers = [
+            context.Process(target=job, args=(alias, i, keys, number, size, barrier, results))
+            for job in (set_job, get_job) for i in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        times, hits = {'set': [], 'get': []}, 0
+        for _ in workers:
+            kind, elapsed, worker_hits = results.get()
+            times[kind].append(elapsed)
+            hits += worker_hits
+        for worker in workers:
+            worker.join()
+        return times, hits
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.sessions import SessionStore
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size: int, **options):
+        deleted = SessionStore.clear_expired(batch_size=batch_size)
+        self.stdout.write(f'Deleted {deleted} expired sessions')
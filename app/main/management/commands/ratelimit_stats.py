@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.ratelimit import rate_limiter
+
+
+class Command(BaseCommand):
+    help = 'Show allowed and rejected requests of every rate limit rule on this host'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='reset counters after output')
+
+    def handle(self, *args, reset: bool, **options):
+        self.stdout.write(f'{"rule":<16}{"allowed":>12}{"rejected":>12}')
+        for name, (allowed, rejected) in rate_limiter.counters().items():
+            self.stdout.write(f'{name:<16}{allowed:>12}{rejected:>12}')
+        if reset:
+            rate_limiter.reset_counters()
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.startup import profile_startup
+
+
+class Command(BaseCommand):
+    help = 'Profile worker boot in a fresh interpreter: imports, AppConfig.ready() and database access'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25, help='slowest modules to show')
+        parser.add_argument('--sort', choices=('time', 'self_time', 'memory'), default='self_time')
+        parser.add_argument('--memory', action='store_true', help='trace memory (makes imports slower)')
+        parser.add_argument('--check', action='store_true', help='fail if STARTUP_BUDGET is exceeded')
+
+    def handle(self, *args, limit: int, sort: str, memory: bool, check: bool, **options):
+        report = profile_startup(trace_memory=memory)
+        if error := report.get('error'):
+            raise CommandError(f'Boot failed:\n{error}')
+
+        records = report['records']
+        imports = sorted((r for r in records if r['kind'] == 'import'), key=lambda r: -r[sort])
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Imports ({len(imports)} modules)'))
+        self.write_records(imports[:limit])
+        self.stdout.write(self.style.MIGRATE_HEADING('AppConfig.ready()'))
+        self.write_records([r for r in records if r['kind'] == 'ready'])
+
+        for query in report['queries']:
+            self.stdout.write(self.style.WARNING(f'DB access ({query["alias"]}) during: {" > ".join(query["during"])}'))
+            self.stdout.write(''.join(query['stack'][-4:]))
+
+        total = f'Boot: {report["total"]:.3f}s, {len(report["queries"])} db queries'
+        if memory:
+            total += f', {report["memory"] / 1024 / 1024:.1f} MiB traced'
+        self.stdout.write(self.style.MIGRATE_HEADING(total))
+
+        if check:
+            budget = settings.STARTUP_BUDGET
+            if report['total'] > budget['TIME'] or len(report['queries']) > budget['QUERIES']:
+                raise CommandError(f'Startup budget exceeded: {budget}')
+
+    def write_records(self, records: list[dict]):
+        self.stdout.write(f'  {"time, ms":>10}{"self, ms":>10}{"memory, KiB":>13}  name')
+        for r in records:
+            self.stdout.write(
+                f'  {r["time"] * 1000:>10.1f}{r["self_time"] * 1000:>10.1f}{r["memory"] / 1024:>13.1f}  {r["name"]}'
+            )
@@ -0,0 +1,29 @@
+from math import ceil
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse
+
+from main.ratelimit import rate_limiter
+
+
+class RateLimitMiddleware:
+    """
+    Rejects requests over RATE_LIMITS rules before sessions, csrf, form parsing and password hashing.
+    Must be the first middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMITS['ENABLED'] or not rate_limiter.rules:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        rule = rate_limiter.match(request)
+        if rule is not None:
+            retry_after = rate_limiter.hit(rule, rate_limiter.client(request))
+            if retry_after:
+                response = HttpResponse('Слишком много запросов, попробуйте позже', status=429)
+                response['Retry-After'] = str(ceil(retry_after))
+                return response
+        return self.get_response(request)
@@ -0,0 +1,161 @@
+import fcntl
+import mmap
+import os
+import re
+import struct
+from contextlib import contextmanager
+from hashlib import blake2b
+from pathlib import Path
+from time import time
+from typing import Any, Iterator, NamedTuple
+
+from django.conf import settings
+from django.http import HttpRequest
+
+
+HEADER = struct.Struct('=8sQ')  # magic, slots
+COUNTER = struct.Struct('=QQ')  # allowed, rejected
+SLOT = struct.Struct('=Qdd')  # key, tokens, updated at
+MAGIC = b'ratelim1'
+MAX_RULES = 32
+STRIPE = 8
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+class Rule(NamedTuple):
+    index: int
+    name: str
+    path: re.Pattern
+    methods: frozenset[str]
+    rate: float  # tokens per second
+    burst: int
+
+
+def parse_rate(rate: str) -> float:
+    """'10/m' -> tokens per second"""
+    count, unit = rate.split('/')
+    return int(count) / RATE_UNITS[unit]
+
+
+class SharedRateLimiter:
+    """
+    Token buckets in a memory mapped file, shared by every worker process on the host.
+
+    The file is a header, a counter pair per rule and a table of slots split into stripes of STRIPE slots.
+    A bucket lives in the stripe chosen by its key hash, the stripe is locked with a byte range lock while
+    the bucket is updated. When the stripe is full, the least recently updated slot is reused.
+    """
+
+    def __init__(self, path: Path, slots: int, rules: dict[str, dict[str, Any]], ip_header: str | None = None):
+        if len(rules) > MAX_RULES:
+            raise ValueError(f'At most {MAX_RULES} rate limit rules are supported')
+        self.path = Path(path)
+        self.stripes = max(slots // STRIPE, 1)
+        self.ip_header = ip_header
+        self.rules = [
+            Rule(
+                index=index, name=name, path=re.compile(rule['PATH']),
+                methods=frozenset(rule.get('METHODS', ('POST', ))),
+                rate=parse_rate(rule['RATE']), burst=rule['BURST'],
+            )
+            for index, (name, rule) in enumerate(rules.items())
+        ]
+        self.counters_offset = HEADER.size
+        self.slots_offset = self.counters_offset + MAX_RULES * COUNTER.size
+        self.size = self.slots_offset + self.stripes * STRIPE * SLOT.size
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    @classmethod
+    def from_settings(cls) -> "SharedRateLimiter":
+        config = settings.RATE_LIMITS
+        return cls(config['FILE'], config['SLOTS'], config['RULES'], config['IP_HEADER'])
+
+    @property
+    def map(self) -> mmap.mmap:
+        # opened lazily in every worker, after gunicorn forks
+        if self._pid != os.getpid():
+            self.open()
+        return self._map
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(fd, HEADER.size, 0)
+            if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, self.stripes * STRIPE):
+                # new file or another layout, buckets are not worth keeping
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self.size)
+                os.pwrite(fd, HEADER.pack(MAGIC, self.stripes * STRIPE), 0)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self.size)
+        self._pid = os.getpid()
+
+    @contextmanager
+    def locked(self, start: int, length: int) -> Iterator[mmap.mmap]:
+        buffer = self.map
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+        try:
+            yield buffer
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    def match(self, request: HttpRequest) -> Rule | None:
+        for rule in self.rules:
+            if request.method in rule.methods and rule.path.match(request.path_info):
+                return rule
+
+    def client(self, request: HttpRequest) -> str:
+        if self.ip_header and (value := request.META.get(self.ip_header)):
+            return value.split(',')[0].strip()
+        return request.META.get('REMOTE_ADDR', '')
+
+    def hit(self, rule: Rule, client: str) -> float:
+        """Take a token from the client's bucket, returns 0 if allowed or seconds until the next token"""
+        key = int.from_bytes(blake2b(f'{rule.name}:{client}'.encode(), digest_size=8).digest(), 'little') or 1
+        start = self.slots_offset + key % self.stripes * STRIPE * SLOT.size
+        now = time()
+        with self.locked(start, STRIPE * SLOT.size) as buffer:
+            victim, oldest = start, now
+            for position in range(start, start + STRIPE * SLOT.size, SLOT.size):
+                slot_key, tokens, updated = SLOT.unpack_from(buffer, position)
+                if slot_key == key:
+                    tokens = min(rule.burst, tokens + (now - updated) * rule.rate)
+                    break
+                if updated < oldest:
+                    victim, oldest = position, updated
+            else:
+                position, tokens = victim, rule.burst
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            SLOT.pack_into(buffer, position, key, tokens, now)
+        self.count(rule, allowed)
+        return 0 if allowed else (1 - tokens) / rule.rate
+
+    def count(self, rule: Rule, allowed: bool):
+        position = self.counters_offset + rule.index * COUNTER.size
+        with self.locked(position, COUNTER.size) as buffer:
+            passed, rejected = COUNTER.unpack_from(buffer, position)
+            COUNTER.pack_into(buffer, position, passed + allowed, rejected + (not allowed))
+
+    def counters(self) -> dict[str, tuple[int, int]]:
+        """Allowed and rejected requests per rule since the file was created"""
+        return {
+            rule.name: COUNTER.unpack_from(self.map, self.counters_offset + rule.index * COUNTER.size)
+            for rule in self.rules
+        }
+
+    def reset_counters(self):
+        for rule in self.rules:
+            position = self.counters_offset + rule.index * COUNTER.size
+            with self.locked(position, COUNTER.size) as buffer:
+                COUNTER.pack_into(buffer, position, 0, 0)
+
+
+rate_limiter = SharedRateLimiter.from_settings()
@@ -0,0 +1,31 @@
+"""
+Fingerprint of the deployed code that affects rendered pages: RELEASE setting, templates and
+the staticfiles manifest (hashed names of css, js and bundles). Computed once per process,
+a deploy restarts the workers.
+"""
+import os
+from functools import lru_cache
+from hashlib import blake2b
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template import engines
+
+
+def template_files() -> list[Path]:
+    return sorted(
+        path for backend in engines.all() for directory in backend.template_dirs
+        for path in Path(directory).rglob('*') if path.is_file()
+    )
+
+
+@lru_cache(maxsize=None)
+def release_fingerprint() -> str:
+    digest = blake2b(settings.RELEASE.encode(), digest_size=8)
+    for path in template_files():
+        stat = os.stat(path)
+        digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size}\n'.encode())
+    if read_manifest := getattr(staticfiles_storage, 'read_manifest', None):
+        digest.update((read_manifest() or '').encode())
+    return digest.hexdigest()
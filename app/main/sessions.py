@@ -0,0 +1,111 @@
+"""
+Session engine, reads sessions from cache and writes them to the database lazily.
+
+Cached value is (data, digest of data stored in the database, time of the database write).
+Sessions are written to the database when they are created, when their key is cycled and when
+authentication keys change, so the cache can always lose a session without logging anybody out.
+Other changes are written at most once per SESSION_DB_FLUSH_INTERVAL seconds, unchanged sessions
+are not written anywhere.
+"""
+from hashlib import blake2b
+from time import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+def auth_values(data: dict) -> tuple:
+    return tuple(data.get(key) for key in AUTH_KEYS)
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = 'main.sessions'
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_digest = None
+        self._loaded_auth = auth_values({})
+        self._db_digest = None
+        self._synced_at = 0.0
+        self._write_through = False
+
+    def digest(self, data: dict) -> bytes:
+        # encode() is signed with a timestamp, so it is different every time
+        return blake2b(self.serializer().dumps(data), digest_size=16).digest()
+
+    def load(self):
+        try:
+            cached = self._cache.get(self.cache_key)
+        except Exception:
+            # see CachedDBStore.load
+            cached = None
+
+        if cached is None:
+            session = self._get_session_from_db()
+            if not session:
+                return {}
+            data = self.decode(session.session_data)
+            self._db_digest, self._synced_at = self.digest(data), time()
+            # expiry from the row, get_expiry_age() without it would load the session again
+            self.cache_session(data, self.get_expiry_age(expiry=session.expire_date))
+        else:
+            data, self._db_digest, self._synced_at = cached
+            if self._db_digest != self.digest(data) and self.flush_is_due():
+                # SessionMiddleware saves only modified sessions, save() writes it to the database
+                self.modified = True
+        self._loaded_digest = self.digest(data)
+        self._loaded_auth = auth_values(data)
+        return data
+
+    def flush_is_due(self) -> bool:
+        return time() - self._synced_at >= settings.SESSION_DB_FLUSH_INTERVAL
+
+    def cache_session(self, data: dict, timeout: int | None = None):
+        timeout = self.get_expiry_age() if timeout is None else timeout
+        self._cache.set(self.cache_key, (data, self._db_digest, self._synced_at), timeout)
+
+    def save_to_db(self, must_create: bool = False):
+        DBStore.save(self, must_create)
+        self._db_digest, self._synced_at = self.digest(self._session), time()
+        self.cache_session(self._session)
+
+    def must_write_through(self, data: dict) -> bool:
+        """Changes which must not live only in the cache: new or cycled key, login and logout"""
+        return self._write_through or self._db_digest is None or auth_values(data) != self._loaded_auth
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        digest = self.digest(data)
+        if must_create or self.must_write_through(data) or (digest != self._db_digest and self.flush_is_due()):
+            self.save_to_db(must_create)
+            self._write_through = False
+        elif digest != self._loaded_digest:
+            self.cache_session(self._session)
+        self._loaded_digest = digest
+        self._loaded_auth = auth_values(data)
+
+    def cycle_key(self):
+        super().cycle_key()
+        # create() saved the data before login() adds the user to it
+        self._write_through = True
+
+    @classmethod
+    def clear_expired(cls, batch_size: int = 1000) -> int:
+        """Delete expired sessions by primary key batches, so big cleanups don't hold long locks"""
+        model = cls.get_model_class()
+        deleted = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=timezone.now()).values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
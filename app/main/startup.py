@@ -0,0 +1,161 @@
+"""
+Worker boot profiler. Runs in a fresh interpreter (see profile_startup), because by the time
+a management command runs django is already set up and every module is already imported.
+"""
+import json
+import os
+import subprocess
+import sys
+import traceback
+from importlib.abc import Loader, MetaPathFinder
+from time import perf_counter
+from typing import Any
+
+
+class _Measure:
+    __slots__ = ('profiler', 'kind', 'name', 'start', 'memory', 'children')
+
+    def __init__(self, profiler: "StartupProfiler", kind: str, name: str):
+        self.profiler = profiler
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.children = 0.0
+        self.memory = self.profiler.traced_memory()
+        self.profiler.stack.append(self)
+        self.start = perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = perf_counter() - self.start
+        self.profiler.stack.pop()
+        if self.profiler.stack:
+            self.profiler.stack[-1].children += elapsed
+        self.profiler.records.append({
+            'kind': self.kind,
+            'name': self.name,
+            'time': elapsed,
+            'self_time': elapsed - self.children,
+            'memory': self.profiler.traced_memory() - self.memory,
+        })
+
+
+class _ProfilingLoader(Loader):
+
+    def __init__(self, loader: Loader, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name: str):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with _Measure(self._profiler, 'import', module.__name__):
+            self._loader.exec_module(module)
+
+
+class StartupProfiler(MetaPathFinder):
+    """Measures every module import, every AppConfig.ready() and records database access during boot"""
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.records: list[dict[str, Any]] = []
+        self.queries: list[dict[str, Any]] = []
+        self.stack: list[_Measure] = []
+
+    def traced_memory(self) -> int:
+        if not self.trace_memory:
+            return 0
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[0]
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                spec.loader = _ProfilingLoader(spec.loader, self)
+            return spec
+        return None
+
+    def install(self):
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        sys.meta_path.insert(0, self)
+
+        from django.apps import AppConfig
+        from django.db.backends.base.base import BaseDatabaseWrapper
+
+        profiler = self
+        create = AppConfig.create.__func__
+        cursor = BaseDatabaseWrapper.cursor
+
+        def profiled_create(cls, entry):
+            app_config = create(cls, entry)
+            ready = app_config.ready
+
+            def profiled_ready():
+                with _Measure(profiler, 'ready', app_config.name):
+                    ready()
+
+            app_config.ready = profiled_ready
+            return app_config
+
+        def profiled_cursor(connection):
+            profiler.queries.append({
+                'alias': connection.alias,
+                'during': [f'{m.kind} {m.name}' for m in profiler.stack],
+                'stack': traceback.format_stack(limit=12)[:-1],
+            })
+            return cursor(connection)
+
+        AppConfig.create = classmethod(profiled_create)
+        BaseDatabaseWrapper.cursor = profiled_cursor
+
+    def boot(self) -> float:
+        """What a gunicorn worker does before serving the first request"""
+        start = perf_counter()
+        with _Measure(self, 'boot', 'wsgi application'):
+            from django.conf import settings
+            from django.urls import get_resolver
+            from django.utils.module_loading import import_string
+            import_string(settings.WSGI_APPLICATION)
+            get_resolver().url_patterns
+        return perf_counter() - start
+
+    def report(self, total: float) -> dict[str, Any]:
+        return {
+            'total': total,
+            'memory': self.traced_memory(),
+            'records': self.records,
+            'queries': self.queries,
+        }
+
+
+def run_child():
+    profiler = StartupProfiler(trace_memory=os.environ.get('STARTUP_PROFILE_MEMORY') == '1')
+    profiler.install()
+    try:
+        report = profiler.report(profiler.boot())
+    except Exception:
+        report = {'error': traceback.format_exc(), 'queries': profiler.queries}
+    sys.stdout.write(json.dumps(report))
+
+
+def profile_startup(trace_memory: bool = False, timeout: float = 120) -> dict[str, Any]:
+    from django.conf import settings
+
+    env = {**os.environ, 'STARTUP_PROFILE_MEMORY': '1' if trace_memory else '0'}
+    env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+    result = subprocess.run(
+        (sys.executable, '-c', 'from main.startup import run_child; run_child()'),
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=timeout, check=True,
+    )
+    return json.loads(result.stdout)
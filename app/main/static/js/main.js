@@ -15,13 +15,25 @@ window.onload = () => {
     if (formEl) {
         formEl.onsubmit = (e) => {
             e.preventDefault()
-            fetch('/tickets/', {
+            // statically exported pages are rendered without csrf token
+            const tokenReady = formEl.elements['csrfmiddlewaretoken']
+                ? Promise.resolve()
+                : fetch('/tickets/csrf/').then((resp) => resp.text()).then((token) => {
+                    const tokenEl = document.createElement('input')
+                    tokenEl.type = 'hidden'
+                    tokenEl.name = 'csrfmiddlewaretoken'
+                    tokenEl.value = token
+                    formEl.appendChild(tokenEl)
+                })
+            tokenReady.then(() => fetch('/tickets/', {
                 method: 'POST',
                 body: new FormData(formEl),
-            }).then((resp) => {
+            })).then((resp) => {
                 if (resp.status === 200) {
                     e.target.reset()
                     alert('Ваше сообщение отправлено!')
+                } else if (resp.status === 429) {
+                    alert('Слишком много сообщений, попробуйте позже')
                 } else {
                     alert('Произошла ошибка при отправке сообщения!')
                 }
@@ -41,3 +53,38 @@ const changeActiveContentBlock = (blockId) => {
         }
     }
 }
+
+// provider scripts of facades, each is loaded once
+const scriptLoads = new Map()
+const loadScript = (src) => {
+    if (!scriptLoads.has(src)) {
+        scriptLoads.set(src, new Promise((resolve, reject) => {
+            const scriptEl = document.createElement('script')
+            scriptEl.src = src
+            scriptEl.onload = resolve
+            scriptEl.onerror = reject
+            document.head.append(scriptEl)
+        }))
+    }
+    return scriptLoads.get(src)
+}
+
+// click-to-load embeds, see BaseContentProvider.render_facade
+const loadFacade = (facadeEl) => {
+    if (facadeEl.dataset.loading) return
+    facadeEl.dataset.loading = 'true'
+    const scripts = (facadeEl.dataset.scripts || '').split(' ').filter(Boolean)
+    Promise.all(scripts.map(loadScript))
+        .then(() => facadeEl.replaceWith(facadeEl.querySelector('template').content.cloneNode(true)))
+        .catch(() => delete facadeEl.dataset.loading)
+}
+document.addEventListener('click', (e) => {
+    const facadeEl = e.target.closest('.content-facade')
+    if (facadeEl) loadFacade(facadeEl)
+})
+document.addEventListener('keydown', (e) => {
+    if ((e.key === 'Enter' || e.key === ' ') && e.target.classList.contains('content-facade')) {
+        e.preventDefault()
+        loadFacade(e.target)
+    }
+})
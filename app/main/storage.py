@@ -0,0 +1,158 @@
+import gzip
+import os
+import re
+from hashlib import blake2b
+from multiprocessing import get_context
+from typing import Iterator
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+CSS_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+CSS_STRINGS = re.compile(f'({CSS_STRING}|url\\([^)]*\\))')
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_IMPORT = re.compile(f'@import\\s+(?:{CSS_STRING}|url\\([^)]*\\))[^;]*;')
+CSS_SPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*|(:)\s+')
+
+
+def minify_css(css: str) -> str:
+    css = CSS_COMMENT.sub('', css)
+    # strings and urls are kept as they are
+    parts = CSS_STRINGS.split(css)
+    for i in range(0, len(parts), 2):
+        part = CSS_SPACE.sub(' ', parts[i])
+        parts[i] = CSS_PUNCTUATION.sub(lambda m: m.group(1) or m.group(2), part)
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+def join_css(sources: list[str]) -> str:
+    """@import is ignored by browsers after other rules, so imports of all files go to the top"""
+    imports, rules = [], []
+    for source in sources:
+        imports.extend(CSS_IMPORT.findall(source))
+        rules.append(CSS_IMPORT.sub('', source))
+    return '\n'.join((*imports, *rules))
+
+
+def skip_marker(target: str) -> str:
+    return f'{target}.skip'
+
+
+def write_compressed(path: str, suffix: str, data: bytes, source: bytes):
+    target = path + suffix
+    if len(data) >= os.path.getsize(path) * 0.95:
+        # not worth it, nginx will serve the file itself, the marker remembers the decision for the next run
+        if os.path.exists(target):
+            os.remove(target)
+        with open(skip_marker(target), 'w') as file:
+            file.write(blake2b(source, digest_size=16).hexdigest())
+        return
+    tmp = f'{target}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(data)
+    os.replace(tmp, target)
+    if os.path.exists(skip_marker(target)):
+        os.remove(skip_marker(target))
+
+
+DECOMPRESS = {'.gz': gzip.decompress, '.br': brotli and brotli.decompress}
+
+
+def is_outdated(path: str, suffix: str, data: bytes | None = None) -> bool:
+    """Whether the compressed sibling, or the marker of a skipped one, is missing or doesn't match the file"""
+    target = path + suffix
+    skipped = not os.path.exists(target) and os.path.exists(skip_marker(target))
+    if skipped:
+        target = skip_marker(target)
+    try:
+        if os.path.getmtime(target) >= os.path.getmtime(path):
+            return False
+    except FileNotFoundError:
+        return True
+    if data is None:
+        return True
+    # manifest storage rewrites processed css on every run, same content doesn't need compression again
+    with open(target, 'rb') as file:
+        content = file.read()
+    if skipped:
+        if content.decode() != blake2b(data, digest_size=16).hexdigest():
+            return True
+    elif DECOMPRESS[suffix](content) != data:
+        return True
+    os.utime(target)
+    return False
+
+
+def compress_file(path: str) -> str:
+    """Write path.gz and path.br (if brotli is installed) next to the file, for nginx gzip_static/brotli_static"""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if is_outdated(path, '.gz', data):
+        write_compressed(path, '.gz', gzip.compress(data, compresslevel=9, mtime=0), data)
+    if brotli is not None and is_outdated(path, '.br', data):
+        write_compressed(path, '.br', brotli.compress(data, quality=11), data)
+    return path
+
+
+class BundledManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Builds STATIC_BUNDLES at collectstatic, before files are hashed, so bundles get hashed names
+    and manifest entries as every other file. A bundle should be in the directory of its sources,
+    then relative url() references stay valid.
+    """
+
+    def build_bundles(self) -> Iterator[str]:
+        for name, sources in settings.STATIC_BUNDLES.items():
+            content = minify_css(join_css([self.open(source).read().decode() for source in sources])).encode()
+            if self.exists(name):
+                with self.open(name) as file:
+                    if file.read() == content:
+                        yield name
+                        continue
+                self.delete(name)
+            self._save(name, ContentFile(content))
+            yield name
+
+    compress_extensions = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.html', '.ico', '.ttf', '.eot')
+    compress_min_size = 512
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+        for name in self.build_bundles():
+            paths[name] = (self, name)
+        names = set(paths)
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name:
+                names.add(hashed_name)
+            yield name, hashed_name, processed
+        self.compress(names)
+
+    def compress(self, names: set[str]):
+        """Precompress files, whose siblings are missing or older than them, in parallel"""
+        paths = []
+        for name in names:
+            path = self.path(name)
+            if name.endswith(self.compress_extensions) and os.path.getsize(path) >= self.compress_min_size:
+                if is_outdated(path, '.gz') or (brotli is not None and is_outdated(path, '.br')):
+                    paths.append(path)
+        if len(paths) <= 1:
+            list(map(compress_file, paths))
+            return
+        with get_context('fork').Pool() as pool:
+            list(pool.imap_unordered(compress_file, paths, chunksize=8))
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # collectstatic wasn't run (development, tests), files are served by finders as they are
+            return name
+        return super().stored_name(name)
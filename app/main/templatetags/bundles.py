@@ -0,0 +1,16 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def static_bundle(name: str) -> str:
+    """Stylesheet link to the hashed bundle, links to its source files in DEBUG or before collectstatic"""
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    names = [name] if not settings.DEBUG and name in hashed_files else settings.STATIC_BUNDLES[name]
+    return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((static(n), ) for n in names))
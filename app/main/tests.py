@@ -0,0 +1,286 @@
+import re
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.middleware.csrf import _unmask_cipher_token
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from lessons.cache import page_cache, CSRF_PLACEHOLDER
+from lessons.models import School
+from main.cache import SQLiteCache, INT64_MAX
+from main.ratelimit import SharedRateLimiter
+from main.sessions import SessionStore
+from main.startup import profile_startup
+
+
+class StartupBudgetTest(SimpleTestCase):
+
+    def test_boot_within_budget(self):
+        report = profile_startup()
+        self.assertNotIn('error', report, report.get('error'))
+        budget = settings.STARTUP_BUDGET
+        during = [' > '.join(query['during']) for query in report['queries']]
+        self.assertLessEqual(len(during), budget['QUERIES'], f'DB queries during boot: {during}')
+        self.assertLessEqual(report['total'], budget['TIME'])
+
+
+class SQLiteCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = Path(directory.name) / 'cache.sqlite3'
+        self.cache = self.make_cache()
+
+    @staticmethod
+    @contextmanager
+    def at(now: float):
+        # expiry is computed by django with time.time, checked by the backend with its own import
+        with mock.patch('main.cache.time', return_value=now), mock.patch('time.time', return_value=now):
+            yield
+
+    def make_cache(self, **options) -> SQLiteCache:
+        return SQLiteCache(str(self.location), {'OPTIONS': options})
+
+    def test_timeout_expiry(self):
+        with self.at(1000.0):
+            self.cache.set('short', 'value', 10)
+            self.cache.set('forever', 'value', None)
+        with self.at(1009.0):
+            self.assertEqual(self.cache.get('short'), 'value')
+        with self.at(1011.0):
+            self.assertIsNone(self.cache.get('short'))
+            self.assertFalse(self.cache.has_key('short'))
+            self.assertEqual(self.cache.get_many(['short', 'forever']), {'forever': 'value'})
+
+    def test_cull_evicts_least_recently_used(self):
+        cache = self.make_cache(MAX_ENTRIES=4, CULL_FREQUENCY=2, CULL_EVERY=1, ACCESS_RESOLUTION=0)
+        for i in range(4):
+            with self.at(1000.0 + i):
+                cache.set(f'key-{i}', i, None)
+        with self.at(1010.0):
+            cache.get('key-0')
+        with self.at(1011.0):
+            cache.set('key-4', 4, None)
+        # 5 entries over MAX_ENTRIES 4 -> 1 excess + 4 // 2, the least recently used of them go
+        self.assertEqual(sorted(cache.get_many([f'key-{i}' for i in range(5)])), ['key-0', 'key-4'])
+
+    def test_cull_drops_expired(self):
+        cache = self.make_cache(CULL_EVERY=1)
+        with self.at(1000.0):
+            cache.set('short', 'value', 10)
+        with self.at(1020.0):
+            cache.set('other', 'value', None)
+        (count, ), = cache.connection.execute('SELECT count(*) FROM cache').fetchall()
+        self.assertEqual(count, 1)
+
+    def test_add(self):
+        with self.at(1000.0):
+            self.assertTrue(self.cache.add('key', 'first', 10))
+            self.assertFalse(self.cache.add('key', 'second', 10))
+            self.assertEqual(self.cache.get('key'), 'first')
+        with self.at(1011.0):
+            self.assertTrue(self.cache.add('key', 'third', 10))
+            self.assertEqual(self.cache.get('key'), 'third')
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.decr('counter', 5), -3)
+        self.assertEqual(self.make_cache().get('counter'), -3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_outside_int64(self):
+        self.cache.set('counter', INT64_MAX)
+        self.assertEqual(self.cache.incr('counter'), INT64_MAX + 1)
+        self.assertEqual(self.cache.get('counter'), INT64_MAX + 1)
+        self.assertEqual(self.cache.incr('counter', -2), INT64_MAX - 1)
+        self.cache.set('float', 1.5)
+        self.assertEqual(self.cache.incr('float'), 2.5)
+
+    def test_incr_keeps_no_transaction_open(self):
+        self.cache.set('counter', 1)
+        self.cache.incr('counter')
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.assertFalse(self.cache.connection.in_transaction)
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'main-tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PageCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        School.objects.create(position=1, title='Школа', slug='school')
+
+    def setUp(self):
+        caches['default'].clear()
+        patcher = mock.patch.object(page_cache, 'set', wraps=page_cache.set)
+        self.page_set = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def csrf_secret(client: Client, content: bytes) -> str:
+        token, = re.findall(r'name="csrfmiddlewaretoken" value="([^"]+)"', content.decode())
+        secret = _unmask_cipher_token(token)
+        assert secret == client.cookies[settings.CSRF_COOKIE_NAME].value
+        return secret
+
+    def test_clients_get_own_csrf_tokens(self):
+        first, second = Client(), Client()
+        first_content, second_content = first.get('/').content, second.get('/').content
+        self.assertEqual(self.page_set.call_count, 1)
+        self.assertNotIn(CSRF_PLACEHOLDER.encode(), second_content)
+        self.assertNotEqual(self.csrf_secret(first, first_content), self.csrf_secret(second, second_content))
+        # the same client keeps its token on a cached page
+        self.assertEqual(self.csrf_secret(first, first.get('/').content), first.cookies[settings.CSRF_COOKIE_NAME].value)
+        self.assertEqual(self.page_set.call_count, 1)
+
+    def test_key_ignores_query_parameter_order(self):
+        self.client.get('/?a=1&b=2&b=3')
+        self.client.get('/?b=2&a=1&b=3')
+        self.assertEqual(self.page_set.call_count, 1)
+        self.client.get('/?b=3&a=1&b=2')
+        self.client.get('/?a=2')
+        self.client.get('/')
+        self.assertEqual(self.page_set.call_count, 4)
+
+
+class RateLimitTest(SimpleTestCase):
+    rules = {
+        'login': {'PATH': r'^/admin/login/$', 'METHODS': ['POST'], 'RATE': '2/m', 'BURST': 2},
+        'tickets': {'PATH': r'^/tickets/$', 'METHODS': ['POST'], 'RATE': '5/h', 'BURST': 3},
+    }
+
+    def setUp(self):
+        # the limiter of settings shares its file with running servers, tests get their own
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.limiter = SharedRateLimiter(Path(directory.name) / 'ratelimit', 64, self.rules, 'HTTP_X_REAL_IP')
+        patcher = mock.patch('main.middleware.rate_limiter', self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rejects_over_burst(self):
+        login = self.limiter.rules[0]
+        self.assertEqual([self.limiter.hit(login, '10.0.0.1') for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(self.limiter.hit(login, '10.0.0.1'), 30, delta=1)
+        self.assertEqual(self.limiter.hit(login, '10.0.0.2'), 0)
+        self.assertEqual(self.limiter.counters(), {'login': (3, 1), 'tickets': (0, 0)})
+
+    def test_window_resets(self):
+        login = self.limiter.rules[0]
+        with mock.patch('main.ratelimit.time', return_value=1000.0):
+            self.assertEqual([self.limiter.hit(login, '10.0.0.1') for _ in range(2)], [0, 0])
+            self.assertGreater(self.limiter.hit(login, '10.0.0.1'), 0)
+        # 2/m is a token per 30 seconds
+        with mock.patch('main.ratelimit.time', return_value=1029.0):
+            self.assertGreater(self.limiter.hit(login, '10.0.0.1'), 0)
+        with mock.patch('main.ratelimit.time', return_value=1060.0):
+            self.assertEqual(self.limiter.hit(login, '10.0.0.1'), 0)
+        # refilled up to the burst, not beyond it
+        with mock.patch('main.ratelimit.time', return_value=1200.0):
+            self.assertEqual([self.limiter.hit(login, '10.0.0.1') for _ in range(2)], [0, 0])
+            self.assertGreater(self.limiter.hit(login, '10.0.0.1'), 0)
+
+    @override_settings(CACHES=LOCMEM_CACHES, RATE_LIMITS={**settings.RATE_LIMITS, 'ENABLED': True})
+    def test_middleware(self):
+        client = Client(HTTP_X_REAL_IP='10.0.0.1')
+        statuses = [client.post('/tickets/', {}).status_code for _ in range(4)]
+        self.assertEqual(statuses, [400, 400, 400, 429])
+        response = client.post('/tickets/', {})
+        self.assertGreater(int(response['Retry-After']), 0)
+        # buckets are per client address and rule, other methods aren't limited
+        self.assertEqual(Client(HTTP_X_REAL_IP='10.0.0.2').post('/tickets/', {}).status_code, 400)
+        self.assertEqual(client.get('/tickets/').status_code, 400)
+        self.assertEqual([client.post('/admin/login/', {}).status_code for _ in range(3)], [200, 200, 429])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SESSION_DB_FLUSH_INTERVAL=60)
+class SessionStoreTest(TestCase):
+
+    def setUp(self):
+        self.addCleanup(caches['default'].clear)
+        self.now = 1000.0
+        patcher = mock.patch('main.sessions.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        session = SessionStore()
+        session['cart'] = 1
+        session.save()
+        self.key = session.session_key
+
+    def stored(self) -> dict:
+        return SessionStore().decode(Session.objects.get(session_key=self.key).session_data)
+
+    def request(self, **changes) -> SessionStore:
+        """Load the session like SessionMiddleware does and save it if it was modified"""
+        session = SessionStore(self.key)
+        session.update(changes)
+        if session.modified:
+            session.save()
+        return session
+
+    def test_new_session_is_written_to_database(self):
+        self.assertEqual(self.stored(), {'cart': 1})
+
+    def test_changes_are_written_to_database_lazily(self):
+        with self.assertNumQueries(0):
+            self.request(cart=2)
+        self.assertEqual(SessionStore(self.key)['cart'], 2)
+        self.assertEqual(self.stored(), {'cart': 1})
+        self.now += 30
+        with self.assertNumQueries(0):
+            self.request(cart=3)
+        self.now += 30
+        self.request()
+        self.assertEqual(self.stored(), {'cart': 3})
+
+    def test_unchanged_session_isnt_written(self):
+        self.now += 120
+        with self.assertNumQueries(0), mock.patch.object(SessionStore, 'cache_session') as cache_session:
+            session = self.request(cart=1)
+            session.save()
+        cache_session.assert_not_called()
+
+    def test_login_and_logout_are_written_through(self):
+        self.request(**{SESSION_KEY: '1'})
+        self.assertEqual(self.stored()[SESSION_KEY], '1')
+        session = SessionStore(self.key)
+        session.flush()
+        self.assertFalse(Session.objects.filter(session_key=self.key).exists())
+
+    def test_cycled_key_is_written_through(self):
+        session = SessionStore(self.key)
+        session.cycle_key()
+        session['cart'] = 2
+        session.save()
+        self.key = session.session_key
+        self.assertEqual(self.stored(), {'cart': 2})
+
+    def test_lost_cache_keeps_database_copy(self):
+        self.request(**{SESSION_KEY: '1'})
+        self.request(cart=2)
+        caches['default'].clear()
+        self.assertEqual(dict(SessionStore(self.key).items()), {'cart': 1, SESSION_KEY: '1'})
+
+    def test_clear_expired(self):
+        expired = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{i}', session_data='', expire_date=expired) for i in range(5)
+        )
+        self.assertEqual(SessionStore.clear_expired(batch_size=2), 5)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [self.key])
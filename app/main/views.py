@@ -5,11 +5,14 @@ class BaseContextMixin:
 
     title: str = ''
     need_ticket_form = True
+    csrf_token_placeholder: str | None = None
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.need_ticket_form:
             context['ticket_form'] = TicketForm()
+        if self.csrf_token_placeholder is not None:
+            context['csrf_token'] = self.csrf_token_placeholder
         context['title'] = self.get_title()
         context['navbar_history'] = self.get_navbar_history(**kwargs)
         return context
@@ -1,3 +1 @@
-set MIGRATION_ALERT=1
 python manage.py makemigrations && python manage.py migrate
-set MIGRATION_ALERT=
\ No newline at end of file
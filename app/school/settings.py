@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'main.apps.MainConfig',
     'users.apps.UsersConfig',
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.RateLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,6 +98,14 @@ USE_TZ = True
 
 STATIC_ROOT = BASE_DIR / 'static'
 STATIC_URL = '/static/'
+STATICFILES_STORAGE = 'main.storage.BundledManifestStaticFilesStorage'
+# built by collectstatic, see main.storage, included with {% static_bundle %}
+STATIC_BUNDLES = {
+    'css/site.css': [
+        'css/normalize.css', 'css/base.css', 'css/header.css', 'css/footer.css',
+        'css/offer.css', 'css/schools.css', 'css/lesson.css',
+    ],
+}
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
@@ -112,8 +122,89 @@ def list_from_env(name: str, required=False, sep=','):
 ALLOWED_HOSTS = list_from_env('ALLOWED_HOSTS')
 CSRF_TRUSTED_ORIGINS = list_from_env('CSRF_TRUSTED_ORIGINS')
 
+# shared by all workers on the host, see main.cache
+CACHES = {
+    'default': {
+        'BACKEND': 'main.cache.SQLiteCache',
+        'LOCATION': env.get('CACHE_LOCATION', BASE_DIR / 'cache' / 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(env.get('CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+
+# sessions are read from cache and written to database when created and then at most once
+# per SESSION_DB_FLUSH_INTERVAL seconds, see main.sessions
+SESSION_ENGINE = 'main.sessions'
+SESSION_DB_FLUSH_INTERVAL = int(env.get('SESSION_DB_FLUSH_INTERVAL', 60))
+
 AUTHENTICATION_BACKENDS = ['users.backends.AuthBackend']
 AUTH_USER_MODEL = 'users.User'
 
 PHONENUMBER_DEFAULT_REGION = 'RU'
 PHONENUMBER_DEFAULT_FORMAT = 'E164'
+
+LESSONS_FRAGMENT_CACHE = {
+    'MAX_SIZE': int(env.get('LESSONS_FRAGMENT_CACHE_SIZE', 1024)),
+    'BACKEND': env.get('LESSONS_FRAGMENT_CACHE_BACKEND') or None,
+    'TIMEOUT': int(env.get('LESSONS_FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60)),
+}
+
+LESSONS_PAGE_CACHE = {
+    'ENABLED': env.get('LESSONS_PAGE_CACHE', 'true').lower() == 'true',
+    'ALIAS': 'default',
+    # only a safety bound: pages are invalidated by version counters, but
+    # per-process cache backends can't see counters bumped by other workers
+    'TIMEOUT': int(env.get('LESSONS_PAGE_CACHE_TIMEOUT', 5 * 60)),
+}
+
+# search ranks at most this many best title matches and this many other matches found by the GIN index
+# in table order, so common words don't rank the whole catalog, see LessonQuerySet.search
+LESSONS_SEARCH_CANDIDATES = int(env.get('LESSONS_SEARCH_CANDIDATES', 1000))
+
+# provider choice id ('<content type>,<provider id>') -> render click-to-load facade instead of the embed,
+# providers not listed here use their `facade` attribute
+LESSONS_CONTENT_FACADES = {}
+
+# 'prefetch' - lesson page loads contents with prefetch_related,
+# 'json' - lesson, school and contents are fetched in one statement (PostgreSQL only)
+LESSONS_FETCH_MODE = env.get('LESSONS_FETCH_MODE', 'prefetch')
+
+# checked by main.tests and `manage.py startup_profile --check`
+STARTUP_BUDGET = {
+    'TIME': float(env.get('STARTUP_BUDGET_TIME', 5)),
+    'QUERIES': int(env.get('STARTUP_BUDGET_QUERIES', 0)),
+}
+
+# deployed version, salts ETags of catalog pages together with templates and static files, see main.release
+RELEASE = env.get('RELEASE', '')
+
+# 'sync' - ticket is saved on request, 'spool' - ticket is appended to spool file
+# and moved to database by `manage.py flush_tickets`
+TICKETS_INTAKE = env.get('TICKETS_INTAKE', 'sync')
+TICKETS_SPOOL_DIR = Path(env.get('TICKETS_SPOOL_DIR', BASE_DIR / 'spool'))
+
+# token buckets shared by all workers on the host through a memory mapped file,
+# see main.ratelimit, counters are shown by `manage.py ratelimit_stats`
+RATE_LIMITS = {
+    'ENABLED': env.get('RATE_LIMITS', 'true').lower() == 'true',
+    'FILE': Path(env.get('RATE_LIMITS_FILE', '/dev/shm/school-ratelimit')),
+    'SLOTS': int(env.get('RATE_LIMITS_SLOTS', 64 * 1024)),
+    # META key with the client address set by the proxy. In docker-compose the app is reachable only through nginx,
+    # so REMOTE_ADDR is nginx for every visitor and buckets must be keyed by the header, the nginx server block needs
+    # `proxy_set_header X-Real-IP $remote_addr;`. Without the header REMOTE_ADDR is used (runserver),
+    # RATE_LIMITS_IP_HEADER= (empty) always uses REMOTE_ADDR, only when clients connect to the app directly.
+    'IP_HEADER': env.get('RATE_LIMITS_IP_HEADER', 'HTTP_X_REAL_IP') or None,
+    'RULES': {
+        'login': {'PATH': r'^/admin/login/$', 'METHODS': ['POST'], 'RATE': '10/m', 'BURST': 10},
+        'tickets': {'PATH': r'^/tickets/$', 'METHODS': ['POST'], 'RATE': '5/h', 'BURST': 3},
+    },
+}
+
+# responsive variants of school and lesson covers, see lessons.covers
+# changed values are applied by `manage.py rebuild_covers`, outdated variants are also rebuilt on first render
+COVER_VARIANTS = {
+    'WIDTHS': [320, 640, 960],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': int(env.get('COVER_VARIANTS_QUALITY', 80)),
+}
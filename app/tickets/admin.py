@@ -1,12 +1,12 @@
 from django.contrib import admin
 
-from main.admin import ModelAdmin
+from main.admin import ModelAdmin, KeysetPaginationMixin
 from tickets.models import Ticket
 
 
 @admin.register(Ticket)
-class TicketAdmin(ModelAdmin):
+class TicketAdmin(KeysetPaginationMixin, ModelAdmin):
     list_display = ('first_name', 'theme', 'processed')
     readonly_fields = ('first_name', 'email', 'phone', 'theme', 'message',)
     list_filter = ('processed',)
-    ordering = ('processed', )
+    ordering = keyset_fields = ('processed', 'id')
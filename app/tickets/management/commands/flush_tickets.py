@@ -0,0 +1,24 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tickets.spool import ticket_spool
+
+
+class Command(BaseCommand):
+    help = 'Move tickets from the spool into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='keep flushing every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5)
+
+    def handle(self, *args, batch_size: int, loop: bool, interval: float, **options):
+        while True:
+            close_old_connections()
+            if processed := ticket_spool.flush(batch_size=batch_size):
+                self.stdout.write(f'{processed} tickets flushed')
+            if not loop:
+                break
+            sleep(interval)
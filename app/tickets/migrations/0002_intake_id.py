@@ -0,0 +1,18 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='intake_id',
+            field=models.UUIDField(editable=False, null=True, unique=True),
+        ),
+    ]
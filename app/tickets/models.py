@@ -10,8 +10,15 @@ class Ticket(models.Model):
     theme: str = models.CharField('Тема обращения', max_length=50)
     message: str = models.TextField('Сообщение')
     processed: bool = models.BooleanField('Обработано', default=False)
+    # set for tickets that came through the spool, see tickets.spool
+    intake_id = models.UUIDField(unique=True, null=True, editable=False)
 
     class Meta:
         db_table = "tickets"
         verbose_name = 'Обращение'
         verbose_name_plural = 'Обращения'
+        indexes = (
+            # keyset pagination of TicketAdmin
+            models.Index(fields=('processed', 'id'), name='tickets_processed_id_idx'),
+            models.Index(fields=('id', ), condition=models.Q(processed=False), name='tickets_unprocessed_idx'),
+        )
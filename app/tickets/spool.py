@@ -0,0 +1,152 @@
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from time import time_ns
+from typing import Any, Iterator
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError, transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+class TicketSpool:
+    """
+    Durable append-only buffer of validated tickets.
+
+    Every ticket is one json line, written by a single O_APPEND write and fsync-ed before the request is answered.
+    flush() renames the current file to a batch file under an exclusive lock, so writers continue with a new file,
+    and moves batches into Ticket with bulk_create. Lines carry intake_id (unique column), so a batch replayed
+    after a crash doesn't produce duplicates. Lines which can't become a ticket are moved to rejected_name
+    with the reason, so one bad line doesn't hold back every ticket queued after it.
+    """
+    current_name = 'tickets.ndjson'
+    rejected_name = 'rejected.ndjson'
+    batch_prefix = 'batch-'
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    @classmethod
+    def from_settings(cls) -> "TicketSpool":
+        return cls(settings.TICKETS_SPOOL_DIR)
+
+    @contextmanager
+    def lock(self, name: str, operation: int) -> Iterator[None]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.directory / name, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)
+
+    def fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def append(self, cleaned_data: dict[str, Any]) -> str:
+        intake_id = uuid4().hex
+        line = json.dumps({'intake_id': intake_id, **{k: str(v) for k, v in cleaned_data.items()}}) + '\n'
+        with self.lock('append.lock', fcntl.LOCK_SH):
+            fd = os.open(self.directory / self.current_name, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line.encode())
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        return intake_id
+
+    def rotate(self):
+        current = self.directory / self.current_name
+        with self.lock('append.lock', fcntl.LOCK_EX):
+            if current.exists() and current.stat().st_size:
+                os.rename(current, self.directory / f'{self.batch_prefix}{time_ns()}.ndjson')
+                self.fsync_directory()
+
+    def read_batch(self, path: Path) -> Iterator[tuple[int, str, dict[str, Any] | None]]:
+        with path.open() as file:
+            for number, line in enumerate(file, 1):
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    data = None
+                yield number, line, data if isinstance(data, dict) else None
+
+    def reject(self, path: Path, number: int, line: str, error: str):
+        logger.error('Rejected spooled ticket %s:%s: %s', path.name, number, error)
+        record = json.dumps(
+            {'batch': path.name, 'line': number, 'error': error, 'data': line.rstrip('\n')}, ensure_ascii=False
+        )
+        with (self.directory / self.rejected_name).open('a') as file:
+            file.write(record + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+    def build_tickets(self, path: Path) -> list:
+        from tickets.models import Ticket
+
+        fields = {field.name for field in Ticket._meta.concrete_fields} - {'id'}
+        tickets = []
+        for number, line, data in self.read_batch(path):
+            if data is None:
+                self.reject(path, number, line, 'Неверный JSON')
+                continue
+            if unknown := set(data) - fields:
+                self.reject(path, number, line, f'Неизвестные поля: {", ".join(sorted(unknown))}')
+                continue
+            ticket = Ticket(**data)
+            try:
+                ticket.full_clean(validate_unique=False)
+            except ValidationError as e:
+                self.reject(path, number, line, '; '.join(f'{k}: {" ".join(v)}' for k, v in e.message_dict.items()))
+                continue
+            ticket._spool_line = (number, line)
+            tickets.append(ticket)
+        return tickets
+
+    def save_tickets(self, path: Path, tickets: list, batch_size: int) -> int:
+        from tickets.models import Ticket
+
+        try:
+            with transaction.atomic():
+                Ticket.objects.bulk_create(tickets, batch_size=batch_size, ignore_conflicts=True)
+            return len(tickets)
+        except (IntegrityError, DataError):
+            # find the rows the database refuses, connection errors are raised and the batch is retried
+            saved = 0
+            for ticket in tickets:
+                try:
+                    with transaction.atomic():
+                        Ticket.objects.bulk_create([ticket], ignore_conflicts=True)
+                except (IntegrityError, DataError) as e:
+                    self.reject(path, *ticket._spool_line, str(e))
+                else:
+                    saved += 1
+            return saved
+
+    def flush(self, batch_size: int = 500) -> int:
+        """Move spooled tickets into the database, returns number of tickets, rejected lines are not counted"""
+        try:
+            with self.lock('flush.lock', fcntl.LOCK_EX | fcntl.LOCK_NB):
+                self.rotate()
+                processed = 0
+                for path in sorted(self.directory.glob(f'{self.batch_prefix}*.ndjson')):
+                    processed += self.save_tickets(path, self.build_tickets(path), batch_size)
+                    path.unlink()
+                return processed
+        except BlockingIOError:
+            # another flusher is running
+            return 0
+
+
+ticket_spool = TicketSpool.from_settings()
@@ -0,0 +1,152 @@
+import fcntl
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+from uuid import UUID
+
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from tickets.admin import TicketAdmin
+from tickets.models import Ticket
+from tickets.spool import TicketSpool
+from users.models import User
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tickets-tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@mock.patch.object(TicketAdmin, 'list_per_page', 2)
+class KeysetPaginationTest(TestCase):
+    url = reverse('admin:tickets_ticket_changelist')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='password')
+        # ties on processed are broken by id
+        tickets = Ticket.objects.bulk_create(
+            Ticket(first_name=f'Имя {i}', email='a@example.com', phone='+79991234567', theme='Тема', message='',
+                   processed=processed)
+            for i, processed in enumerate((True, False, True, False, False))
+        )
+        cls.expected = [t.id for t in sorted(tickets, key=lambda t: (t.processed, t.id))]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get_page(self, query: str = '') -> tuple[list[int], str | None, str | None]:
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        cl = response.context['cl']
+        return [ticket.id for ticket in cl.result_list], cl.next_page_url, cl.previous_page_url
+
+    def test_next_pages(self):
+        ids, next_url, previous_url = self.get_page()
+        self.assertIsNone(previous_url)
+        pages = [ids]
+        while next_url:
+            ids, next_url, previous_url = self.get_page(next_url)
+            self.assertIsNotNone(previous_url)
+            pages.append(ids)
+        self.assertEqual(pages, [self.expected[:2], self.expected[2:4], self.expected[4:]])
+
+    def test_previous_pages(self):
+        _, next_url, _ = self.get_page()
+        _, next_url, _ = self.get_page(next_url)
+        ids, next_url, previous_url = self.get_page(next_url)
+        self.assertEqual(ids, self.expected[4:])
+        self.assertIsNone(next_url)
+        ids, next_url, previous_url = self.get_page(previous_url)
+        self.assertEqual(ids, self.expected[2:4])
+        self.assertIsNotNone(next_url)
+        ids, next_url, previous_url = self.get_page(previous_url)
+        self.assertEqual(ids, self.expected[:2])
+        self.assertIsNone(previous_url)
+        self.assertEqual(self.get_page(next_url)[0], self.expected[2:4])
+
+    def test_filters_are_kept(self):
+        ids, next_url, _ = self.get_page('?processed__exact=0')
+        self.assertIn('processed__exact=0', next_url)
+        self.assertEqual(ids + self.get_page(next_url)[0], self.expected[:3])
+
+    def test_malformed_cursor(self):
+        for cursor in ('not-json', '[1]', '[false, 1, 2]', '["x", "y"]', '{}'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'after': cursor})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'before': '[1]'}).status_code, 400)
+
+
+class TicketSpoolTest(TestCase):
+    ticket = {
+        'first_name': 'Имя', 'email': 'a@example.com', 'phone': '+79991234567', 'theme': 'Тема', 'message': 'Текст',
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = TicketSpool(Path(directory.name))
+
+    def write_batch(self, *lines: str):
+        (self.spool.directory / 'batch-1.ndjson').write_text(''.join(f'{line}\n' for line in lines))
+
+    def rejected(self) -> list[dict]:
+        path = self.spool.directory / self.spool.rejected_name
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+    def test_flush(self):
+        ids = [self.spool.append({**self.ticket, 'first_name': f'Имя {i}'}) for i in range(3)]
+        self.assertEqual(self.spool.flush(), 3)
+        self.assertEqual(sorted(Ticket.objects.values_list('intake_id', flat=True)), sorted(map(UUID, ids)))
+        self.assertEqual(list(self.spool.directory.glob('*.ndjson')), [])
+        self.assertEqual(self.spool.flush(), 0)
+
+    def test_replayed_batch_isnt_duplicated(self):
+        self.spool.append(self.ticket)
+        line = (self.spool.directory / self.spool.current_name).read_text()
+        self.spool.flush()
+        # a crash after the commit and before the batch file was removed
+        self.write_batch(line.rstrip())
+        self.spool.flush()
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_bad_lines_are_quarantined(self):
+        good = json.dumps({'intake_id': '0' * 32, **self.ticket})
+        self.write_batch(
+            '{not json', '[1, 2]', json.dumps({**self.ticket, 'color': 'red'}),
+            json.dumps({**self.ticket, 'email': 'not an email'}), good,
+        )
+        with self.assertLogs('tickets.spool', 'ERROR') as logs:
+            self.assertEqual(self.spool.flush(), 1)
+        self.assertEqual(len(logs.records), 4)
+        self.assertEqual(Ticket.objects.get().intake_id.hex, '0' * 32)
+        rejected = self.rejected()
+        self.assertEqual([(r['batch'], r['line']) for r in rejected], [('batch-1.ndjson', i) for i in range(1, 5)])
+        self.assertEqual(rejected[0]['data'], '{not json')
+        self.assertIn('color', rejected[2]['error'])
+        self.assertIn('email', rejected[3]['error'])
+        self.assertFalse((self.spool.directory / 'batch-1.ndjson').exists())
+
+    def test_rows_refused_by_database_are_quarantined(self):
+        names = ('Первый', 'Плохой', 'Третий')
+        self.write_batch(*(json.dumps({**self.ticket, 'first_name': name}) for name in names))
+        bulk_create = Ticket.objects.bulk_create
+
+        def refuse_bad(tickets, *args, **kwargs):
+            if any(ticket.first_name == 'Плохой' for ticket in tickets):
+                raise IntegrityError('refused')
+            return bulk_create(tickets, *args, **kwargs)
+
+        with mock.patch.object(Ticket.objects, 'bulk_create', side_effect=refuse_bad), self.assertLogs('tickets.spool'):
+            self.assertEqual(self.spool.flush(), 2)
+        self.assertEqual(sorted(Ticket.objects.values_list('first_name', flat=True)), ['Первый', 'Третий'])
+        self.assertEqual([(r['line'], r['error']) for r in self.rejected()], [(2, 'refused')])
+
+    def test_one_flusher_at_a_time(self):
+        self.spool.append(self.ticket)
+        with self.spool.lock('flush.lock', fcntl.LOCK_EX):
+            self.assertEqual(TicketSpool(self.spool.directory).flush(), 0)
+        self.assertEqual(self.spool.flush(), 1)
@@ -3,5 +3,6 @@ from django.urls import path
 from tickets.views import *
 
 urlpatterns = [
-    path('', add_ticket)
+    path('', add_ticket),
+    path('csrf/', csrf_token),
 ]
@@ -1,12 +1,25 @@
+from django.conf import settings
 from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.http import require_GET
 
 from tickets.forms import TicketForm
+from tickets.spool import ticket_spool
 
 
 def add_ticket(request):
     if request.method == "POST":
         form = TicketForm(request.POST)
         if form.is_valid():
-            form.save()
+            if settings.TICKETS_INTAKE == 'spool':
+                ticket_spool.append(form.cleaned_data)
+            else:
+                form.save()
             return HttpResponse(status=200, content='OK')
     return HttpResponse(status=400, content='Bad request')
+
+
+@require_GET
+def csrf_token(request):
+    """Token for pages, which were rendered without it (static export)"""
+    return HttpResponse(get_token(request), content_type='text/plain')
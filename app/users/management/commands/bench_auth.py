@@ -0,0 +1,72 @@
+from time import perf_counter
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from users.models import User
+
+
+PASSWORD = 'bench-password'
+
+
+def make_user(i: int, password: str) -> User:
+    return User(
+        username=f'Bench{i}', email=f'Bench.{i}@Example.com', phone=f'+7999{i:07d}', password=password,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Measure AuthBackend.authenticate throughput for username, email and phone logins on a large users table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help='users to generate')
+        parser.add_argument('-n', '--number', type=int, default=2000, help='logins per login kind')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    # password hashing would hide the lookup cost, the benchmark measures lookups
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def handle(self, *args, users: int, number: int, batch_size: int, **options):
+        with transaction.atomic():
+            self.populate(users, batch_size)
+            step = max(users // number, 1)
+            ids = range(0, users, step)[:number]
+            logins = {
+                'username': [f'bench{i}' for i in ids],
+                'email': [f'bench.{i}@example.com' for i in ids],
+                'phone': [f'+7999{i:07d}' for i in ids],
+                'missing': [f'nobody{i}' for i in ids],
+            }
+            self.stdout.write(f'{"login":<10}{"queries":>9}{"logins/s":>11}{"ms/login":>11}')
+            for kind, values in logins.items():
+                with CaptureQueriesContext(connection) as queries:
+                    authenticate(username=values[0], password=PASSWORD)
+                start = perf_counter()
+                for value in values:
+                    user = authenticate(username=value, password=PASSWORD)
+                    assert (user is None) == (kind == 'missing'), value
+                elapsed = perf_counter() - start
+                self.stdout.write(
+                    f'{kind:<10}{len(queries):>9}{len(values) / elapsed:>11.0f}{elapsed / len(values) * 1000:>11.3f}'
+                )
+            for field in ('username', 'email'):
+                plan = User.objects.filter(Exact(Lower(field), logins[field][0])).explain()
+                self.stdout.write(f'\n{field} lookup plan:\n{plan}')
+            transaction.set_rollback(True)
+
+    def populate(self, users: int, batch_size: int):
+        password = make_password(PASSWORD)
+        start = perf_counter()
+        for offset in range(0, users, batch_size):
+            User.objects.bulk_create(
+                [make_user(i, password) for i in range(offset, min(offset + batch_size, users))],
+                batch_size=batch_size,
+            )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(User._meta.db_table)}')
+        self.stdout.write(f'Generated {users} users in {perf_counter() - start:.1f}s')
@@ -3,6 +3,8 @@ from typing import TYPE_CHECKING, Type, Literal, Optional
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import UserManager as DefaultUserManager
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
 from phonenumber_field.phonenumber import PhoneNumber
 
 if TYPE_CHECKING:
@@ -15,8 +17,8 @@ class UserManager(DefaultUserManager):
 
     def get_by(self, field: Literal['username', 'email', 'phone'], value: str | int) -> Optional["User"]:
         if field in ('username', 'email'):
-            field = f'{field}__iexact'
-            value = value.lower()
+            # matches the lower() unique indexes, unlike __iexact which compiles to UPPER()
+            return self.get_or_none(Exact(Lower(field), value.lower()))
         return self.get_or_none(**{field: value})
 
     def get_or_none(self, *args, **kwargs) -> Optional["User"]:
@@ -46,7 +48,7 @@ class UserManager(DefaultUserManager):
             email = self.normalize_email(email)
             if not username:
                 maybe_username, *_ = email.rsplit("@", 1)
-                if not User.objects.filter(username=maybe_username):
+                if self.username_is_unique(maybe_username):
                     username = maybe_username
 
         if username:
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.3 on 2026-10-18 12:00
+
+from django.core.management.base import CommandError
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.functions.text
+
+
+def check_case_duplicates(apps, schema_editor):
+    """Rows differing only by case would fail the constraints with a bare IntegrityError"""
+    User = apps.get_model('users', 'User')
+    duplicates = []
+    for field in ('username', 'email'):
+        lower = django.db.models.functions.text.Lower(field)
+        clashing = User.objects.filter(**{f'{field}__isnull': False}).values(lower=lower).annotate(
+            count=Count('id')
+        ).filter(count__gt=1).values('lower')
+        values = User.objects.annotate(lower=lower).filter(lower__in=clashing).order_by('lower', 'id')
+        duplicates += [f'{field} {value} (id {id})' for id, value in values.values_list('id', field)]
+    if duplicates:
+        raise CommandError(
+            'Users differing only by case must be merged or renamed before adding the case-insensitive '
+            f'unique constraints: {", ".join(duplicates)}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('username'), name='users_username_lower_uniq', violation_error_message='Пользователь с таким логином уже существует'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='users_email_lower_uniq', violation_error_message='Пользователь с таким email уже существует'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, Group as OrigGroup
 from django.core.validators import MinLengthValidator
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
@@ -57,6 +58,17 @@ class User(AbstractBaseUser, PermissionsMixin):
         db_table = 'users'
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        constraints = (
+            # case-insensitive uniqueness, also the indexes used by UserManager.get_by
+            models.UniqueConstraint(
+                Lower('username'), name='users_username_lower_uniq',
+                violation_error_message='Пользователь с таким логином уже существует',
+            ),
+            models.UniqueConstraint(
+                Lower('email'), name='users_email_lower_uniq',
+                violation_error_message='Пользователь с таким email уже существует',
+            ),
+        )
 
     def get_full_name(self):
         return f'{self.last_name} {self.first_name} {self.fathers_name}'.strip() or self.username
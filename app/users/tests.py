@@ -1,3 +1,60 @@
-from django.test import TestCase
+from django.core.management.base import CommandError
+from django.db import connection, IntegrityError, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
 
-# Create your tests here.
+from users.models import User
+
+
+class UserManagerTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_client(username='Ivan', email='Ivan.Petrov@Example.com', phone='+79991234567')
+
+    def test_get_by_ignores_case(self):
+        self.assertEqual(User.objects.get_by('username', 'iVAN'), self.user)
+        self.assertEqual(User.objects.get_by('email', 'ivan.petrov@example.COM'), self.user)
+        self.assertEqual(User.objects.get_by('phone', '+79991234567'), self.user)
+        self.assertIsNone(User.objects.get_by('username', 'petr'))
+        self.assertIsNone(User.objects.get_by('phone', '+79990000000'))
+
+    def test_derived_username_is_unique_ignoring_case(self):
+        user = User.objects.create_client(email='IVAN@mail.example')
+        self.assertEqual(user.username, f'user-{user.id}')
+        user = User.objects.create_client(email='Petr@mail.example')
+        self.assertEqual(user.username, 'Petr')
+
+    def test_case_variants_are_rejected(self):
+        for fields in ({'username': 'IVAN'}, {'email': 'ivan.petrov@example.com'}):
+            with self.subTest(**fields), self.assertRaises(IntegrityError), transaction.atomic():
+                User.objects.create_client(**fields)
+
+
+class CaseDuplicatesMigrationTest(TransactionTestCase):
+    before, after = [('users', '0001_initial')], [('users', '0002_lower_unique_constraints')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        User.objects.all().delete()
+        self.migrate(self.after)
+
+    def test_duplicates_are_listed(self):
+        OldUser = self.migrate(self.before).get_model('users', 'User')
+        OldUser.objects.bulk_create([
+            OldUser(username='ivan', email='a@example.com'), OldUser(username='Ivan', email='A@example.com'),
+            OldUser(username='petr', email='p@example.com'),
+        ])
+        with self.assertRaisesMessage(CommandError, 'username ivan (id') as raised:
+            self.migrate(self.after)
+        message = str(raised.exception)
+        self.assertIn('username Ivan (id', message)
+        self.assertIn('email A@example.com (id', message)
+        self.assertNotIn('petr', message)
+        OldUser.objects.filter(username='Ivan').update(username='ivan2', email='b@example.com')
+        self.migrate(self.after)